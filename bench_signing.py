@@ -0,0 +1,69 @@
+"""
+Microbenchmark da assinatura/montagem das requisições da Shopee.
+
+    python bench_signing.py [n]
+
+Compara o caminho antigo (hmac.new com a chave codificada a cada chamada, URL em f-string
+e payload com json.dumps(indent=2)) com o ShopeeSigner (contexto HMAC copiado, URL e
+corpo compactos). Não faz requisições nem precisa de .env.
+"""
+import hashlib
+import hmac
+import json
+import sys
+import time
+
+from shopee_signing import ShopeeSigner, encode_body
+
+PARTNER_ID = "2001234"
+PARTNER_KEY = "a1b2c3d4e5f6a1b2c3d4e5f6a1b2c3d4e5f6a1b2c3d4e5f6a1b2c3d4e5f6a1b2"
+SHOP_ID = "987654321"
+ACCESS_TOKEN = "4e6f7a5b3c2d1e0f4e6f7a5b3c2d1e0f"
+HOST = "https://partner.shopeemobile.com"
+PATH = "/api/v2/product/update_stock"
+PAYLOAD = {"item_id": 123456789, "stock_list": [{"model_id": m, "stock": m * 3} for m in range(5)]}
+
+
+def legacy_sign(path, timestamp, access_token):
+    base_string = f"{PARTNER_ID}{path}{timestamp}"
+    if access_token:
+        base_string += access_token
+    base_string += str(SHOP_ID)
+    return hmac.new(PARTNER_KEY.encode('utf-8'), base_string.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def legacy_request(path, timestamp, access_token, payload):
+    sign = legacy_sign(path, timestamp, access_token)
+    url = (f"{HOST}{path}?partner_id={PARTNER_ID}&timestamp={timestamp}&sign={sign}"
+           f"&shop_id={SHOP_ID}&access_token={access_token}")
+    logged = json.dumps(payload, indent=2)  # o print do log detalhado
+    return url, json.dumps(payload).encode("utf-8"), logged
+
+
+def rate(func, n):
+    started = time.perf_counter()
+    for i in range(n):
+        func(1700000000 + i)
+    return n / (time.perf_counter() - started)
+
+
+def main(n=200_000):
+    signer = ShopeeSigner(PARTNER_ID, PARTNER_KEY, SHOP_ID, HOST)
+    assert signer.sign(PATH, 1700000000, ACCESS_TOKEN) == legacy_sign(PATH, 1700000000, ACCESS_TOKEN)
+
+    results = [
+        ("assinatura (antigo)", rate(lambda ts: legacy_sign(PATH, ts, ACCESS_TOKEN), n)),
+        ("assinatura (ShopeeSigner)", rate(lambda ts: signer.sign(PATH, ts, ACCESS_TOKEN), n)),
+        ("requisição completa (antigo)",
+         rate(lambda ts: legacy_request(PATH, ts, ACCESS_TOKEN, PAYLOAD), n // 4)),
+        ("requisição completa (ShopeeSigner)",
+         rate(lambda ts: signer.prepare(PATH, ACCESS_TOKEN, PAYLOAD, timestamp=ts), n // 4)),
+    ]
+    for name, per_second in results:
+        print(f"{name:<36}{per_second:>12,.0f} /s")
+    print(f"Corpo: {len(encode_body(PAYLOAD))} bytes compacto vs "
+          f"{len(json.dumps(PAYLOAD, indent=2))} bytes indentado")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
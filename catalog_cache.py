@@ -0,0 +1,189 @@
+import bisect
+import threading
+import time
+
+from product_columns import ProductColumns
+from search_index import normalize, sku_key
+
+
+class ProductRecord:
+    """Um produto do catálogo em memória (__slots__: sem dict por instância)."""
+
+    __slots__ = ("id", "sku", "nome", "estoque_real", "shopee_id", "chave")
+
+    def __init__(self, product_id, sku, nome, estoque_real, shopee_id=None):
+        self.id = product_id
+        self.sku = sku
+        self.nome = nome
+        self.estoque_real = estoque_real
+        self.shopee_id = shopee_id
+        # SKU e nome normalizados, separados como no SQL (sku LIKE ... OR nome LIKE ...)
+        self.chave = (normalize(sku), normalize(nome))
+
+    def matches(self, needle):
+        """Equivalente de '(p.sku LIKE %termo% OR p.nome LIKE %termo%)' para termo já normalizado."""
+        return needle in self.chave[0] or needle in self.chave[1]
+
+    def as_dict(self):
+        """Mesmo formato das linhas de PRODUCT_SELECT."""
+        return {"id": self.id, "sku": self.sku, "nome": self.nome,
+                "estoque_real": self.estoque_real, "shopee_id": self.shopee_id}
+
+
+class ProductCatalog:
+    """
+    Cópia em memória da listagem de produtos, indexada por id e por SKU.
+
+    Quem sincroniza com o banco chama load() (carga completa) ou apply() (só as linhas
+    alteradas desde 'watermark', o maior atualizado_em já visto). As escritas do próprio
+    processo entram na hora com put()/set_stock(). 'version' muda a cada alteração.
+    """
+
+    def __init__(self):
+        self._by_id = {}
+        self._by_sku = {}     # sku_key(SKU) -> registro (mesma comparação da collation do MySQL)
+        self._ids = []        # ids em ordem, para paginação por chave
+        self._lock = threading.RLock()
+
+        self.loaded = False
+        self.watermark = None
+        self.version = 0
+        self.refreshed_at = 0.0
+        self.loaded_at = 0.0
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def _put(self, record):
+        old = self._by_id.get(record.id)
+        if old is None:
+            bisect.insort(self._ids, record.id)
+        elif sku_key(old.sku) != sku_key(record.sku):
+            self._by_sku.pop(sku_key(old.sku), None)
+        self._by_id[record.id] = record
+        self._by_sku[sku_key(record.sku)] = record
+
+    def _advance(self, watermark):
+        if watermark is not None and (self.watermark is None or watermark > self.watermark):
+            self.watermark = watermark
+
+    def load(self, rows, watermark):
+        """Substitui todo o conteúdo pelas 'rows' (dicts de PRODUCT_SELECT)."""
+        records = [ProductRecord(row['id'], row['sku'], row['nome'],
+                                 row['estoque_real'], row['shopee_id']) for row in rows]
+        with self._lock:
+            self._by_id = {record.id: record for record in records}
+            self._by_sku = {sku_key(record.sku): record for record in records}
+            self._ids = sorted(self._by_id)
+            self.watermark = watermark
+            self.loaded = True
+            self.version += 1
+            self.loaded_at = self.refreshed_at = time.monotonic()
+        return records
+
+    def apply(self, rows, watermark):
+        """Aplica linhas novas/alteradas. Retorna os registros que mudaram de fato."""
+        changed = []
+        with self._lock:
+            for row in rows:
+                old = self._by_id.get(row['id'])
+                if old is not None and (old.sku, old.nome, old.estoque_real, old.shopee_id) == (
+                        row['sku'], row['nome'], row['estoque_real'], row['shopee_id']):
+                    continue
+                record = ProductRecord(row['id'], row['sku'], row['nome'],
+                                       row['estoque_real'], row['shopee_id'])
+                self._put(record)
+                changed.append(record)
+            self._advance(watermark)
+            if changed:
+                self.version += 1
+            self.refreshed_at = time.monotonic()
+        return changed
+
+    def put(self, product_id, sku, nome, estoque_real, shopee_id=None):
+        with self._lock:
+            record = ProductRecord(product_id, sku, nome, estoque_real, shopee_id)
+            self._put(record)
+            self.version += 1
+            return record
+
+    def set_stock(self, sku, quantity):
+        """Atualiza o estoque de um SKU já carregado. Retorna False se o SKU não estiver no cache."""
+        with self._lock:
+            record = self._by_sku.get(sku_key(sku))
+            if record is None:
+                return False
+            record.estoque_real = quantity
+            self.version += 1
+            return True
+
+    def set_shopee_id(self, sku, shopee_id):
+        with self._lock:
+            record = self._by_sku.get(sku_key(sku))
+            if record is not None:
+                record.shopee_id = shopee_id
+                self.version += 1
+
+    def expire(self):
+        """Força o próximo acesso a buscar as alterações no banco."""
+        self.refreshed_at = 0.0
+
+    def clear(self):
+        with self._lock:
+            self._by_id = {}
+            self._by_sku = {}
+            self._ids = []
+            self.watermark = None
+            self.loaded = False
+            self.version += 1
+
+    def get(self, product_id):
+        return self._by_id.get(product_id)
+
+    def get_by_sku(self, sku):
+        return self._by_sku.get(sku_key(sku))
+
+    def skus(self):
+        with self._lock:
+            return {record.sku for record in self._by_id.values()}
+
+    def rows(self, ids=None):
+        """Linhas (dicts) dos ids informados, na mesma ordem; sem ids, o catálogo inteiro por id."""
+        with self._lock:
+            if ids is None:
+                ids = self._ids
+            records = (self._by_id.get(product_id) for product_id in ids)
+            return [record.as_dict() for record in records if record is not None]
+
+    def columns(self, ids=None):
+        """Como rows(), mas em ProductColumns (sem um dict por produto)."""
+        columns = ProductColumns()
+        with self._lock:
+            if ids is None:
+                ids = self._ids
+            for product_id in ids:
+                record = self._by_id.get(product_id)
+                if record is not None:
+                    columns.append(record.id, record.sku, record.nome,
+                                   record.estoque_real, record.shopee_id)
+        return columns
+
+    def page(self, after_id=0, limit=500, term=None):
+        """Equivalente em memória de database.get_products_page (termo casa por trecho)."""
+        needle = normalize(term) if term else None
+        result = []
+        with self._lock:
+            position = bisect.bisect_right(self._ids, after_id)
+            while position < len(self._ids) and len(result) < limit:
+                record = self._by_id[self._ids[position]]
+                if needle is None or record.matches(needle):
+                    result.append(record.as_dict())
+                position += 1
+        return result
+
+    def count(self, term=None):
+        if not term:
+            return len(self._by_id)
+        needle = normalize(term)
+        with self._lock:
+            return sum(1 for record in self._by_id.values() if record.matches(needle))
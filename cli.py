@@ -0,0 +1,276 @@
+"""
+Linha de comando do ERP, sem interface gráfica (servidores, cron, systemd).
+
+    python cli.py sync-all               # reenvia o estoque de todos os anúncios
+    python cli.py reconcile              # envia só o que difere do confirmado na Shopee
+    python cli.py pull-orders            # baixa do estoque local as vendas feitas na Shopee
+    python cli.py pull-stock --adopt     # traz alterações de estoque feitas direto na Shopee
+    python cli.py import-stock estoque.csv
+    python cli.py --concurrency 16 daemon
+    python cli.py migrate                # aplica migrações de esquema pendentes
+    python cli.py explain                # confere os planos das consultas mais usadas
+    python cli.py hash-password          # gera o hash para SUPERUSER_PASSWORD no .env
+    python cli.py shopee-auth --code X   # autoriza a loja (primeiro token OAuth)
+
+Não importa main.py: nada de tkinter aqui.
+"""
+import argparse
+import getpass
+import signal
+import sys
+import threading
+import time
+
+import config
+import database
+import db_metrics
+import migrations
+import passwords
+from outbox import OutboxDispatcher
+from pull_sync import pull_orders, pull_remote_stock
+from shopee_auth import ShopeeAuthError, get_shared_token_manager
+from reconcile import reconcile_stock
+from shopee_client import ShopeeClient
+from shopee_sync import ShopeeSyncEngine
+from stock_import import IMPORT_CHUNK_SIZE, import_stock_file
+
+
+def cmd_sync_all(args):
+    queued, _ = reconcile_stock(full=True, workers=args.concurrency)
+    return 0 if queued is not None else 1
+
+
+def cmd_reconcile(args):
+    queued, _ = reconcile_stock(full=False, workers=args.concurrency)
+    return 0 if queued is not None else 1
+
+
+def cmd_pull_orders(args):
+    since = int(time.time()) - args.hours * 3600 if args.hours else None
+    return 0 if pull_orders(since=since) is not None else 1
+
+
+def cmd_pull_stock(args):
+    divergent = pull_remote_stock(adopt=args.adopt)
+    if divergent is None:
+        return 1
+    for sku, item_id, remote, confirmed in divergent[:50]:
+        print(f"  {sku} (item {item_id}): Shopee {remote}, confirmado {confirmed}")
+    if divergent and not args.adopt:
+        print("Use --adopt para aplicar as diferenças ao estoque local.")
+    return 0
+
+
+def cmd_import_stock(args):
+    """Importa estoque de CSV/XLSX em lotes (os envios à Shopee vão para a outbox)."""
+    def progress(report):
+        print(f"  {report.progress:6.1%}  {report.read} linhas, {report.valid} válidas, "
+              f"{report.rejected_count} recusadas ({report.rows_per_second:,.0f}/s)")
+
+    report = import_stock_file(args.file, dry_run=args.dry_run,
+                               chunk_size=args.chunk_size, on_progress=progress)
+    if report is None:
+        print("❌ Importação interrompida por erro no banco (lotes anteriores foram gravados).")
+        return 1
+
+    for line, sku, reason in report.rejected[:20]:
+        print(f"  linha {line}: {sku!r} - {reason}")
+    if report.rejected_count > 20:
+        print(f"  ... e mais {report.rejected_count - 20} linhas recusadas.")
+
+    print(f"Importação concluída: {report.summary()}")
+    if not args.dry_run:
+        print("Os envios para a Shopee ficaram na outbox ('daemon' ou 'reconcile' os processam).")
+    return 0
+
+
+def _print_slow_query(name, elapsed, rows):
+    rows_text = f" ({rows} linhas)" if rows is not None else ""
+    print(f"[DB LENTO] {name} levou {elapsed * 1000:.0f} ms{rows_text}")
+
+
+def cmd_daemon(args):
+    """Mantém o despachante da outbox rodando, lê pedidos da Shopee e reconcilia periodicamente."""
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    db_metrics.add_slow_listener(_print_slow_query)
+    dispatcher = OutboxDispatcher(ShopeeSyncEngine(max_workers=args.concurrency))
+    dispatcher.start()
+    metrics_stop = None
+    if config.DB_METRICS_FILE:
+        metrics_stop = db_metrics.start_prometheus_writer(config.DB_METRICS_FILE,
+                                                          config.DB_METRICS_INTERVAL)
+    print(f"Daemon iniciado ({dispatcher.engine.max_workers} envios simultâneos). "
+          f"Pedidos a cada {args.pull_interval}s, reconciliação a cada {args.reconcile_interval}s.")
+
+    client = ShopeeClient()
+    intervals = {"pull": args.pull_interval, "reconcile": args.reconcile_interval}
+    next_run = {task: time.monotonic() for task, interval in intervals.items() if interval > 0}
+    try:
+        while not stop.is_set():
+            now = time.monotonic()
+            # Pedidos primeiro: as vendas entram no estoque local antes de reconciliar
+            if "pull" in next_run and now >= next_run["pull"]:
+                pull_orders(client)
+                next_run["pull"] = now + intervals["pull"]
+            if "reconcile" in next_run and now >= next_run["reconcile"]:
+                reconcile_stock(full=False, dispatcher=dispatcher)
+                next_run["reconcile"] = now + intervals["reconcile"]
+            wait = min(next_run.values()) - time.monotonic() if next_run else 3600
+            stop.wait(max(0.0, wait))
+    finally:
+        print("Encerrando daemon...")
+        dispatcher.stop(timeout=30)
+        dispatcher.engine.shutdown()
+        if metrics_stop is not None:
+            metrics_stop.set()
+            db_metrics.write_prometheus(config.DB_METRICS_FILE)
+    return 0
+
+
+def cmd_migrate(args):
+    # Pool sem migração automática: --status precisa ver o que está pendente
+    database.get_pool(auto_migrate=False)
+    conn = database.get_db_connection()
+    if not conn:
+        return 1
+    try:
+        pending = migrations.pending_migrations(conn)
+    finally:
+        conn.close()
+
+    if args.status:
+        for version, description in pending:
+            print(f"  pendente: {version} - {description}")
+        print(f"{len(pending)} migrações pendentes (última versão: {migrations.LATEST_VERSION}).")
+        return 0
+
+    result = database.run_migrations()
+    if result is None:
+        return 1
+    applied, skipped = result
+    if skipped:
+        print(f"{len(skipped)} migrações puladas; corrija os dados e rode 'migrate' de novo.")
+        return 1
+    if not applied:
+        print(f"Esquema já está na versão {migrations.LATEST_VERSION}.")
+    return 0
+
+
+def cmd_explain(args):
+    warnings = database.check_query_plans()
+    if warnings is None:
+        return 1
+    for warning in warnings:
+        print(f"⚠️  {warning}")
+    if not warnings:
+        print("Nenhuma varredura completa nas consultas principais.")
+    return 2 if warnings else 0
+
+
+def cmd_hash_password(args):
+    password = getpass.getpass("Senha: ")
+    if not password or password != getpass.getpass("Confirme: "):
+        print("Senhas vazias ou diferentes.")
+        return 1
+    started = time.perf_counter()
+    stored = passwords.hash_password(password)
+    print(stored)
+    print(f"({config.PASSWORD_HASH_ALGORITHM}, {(time.perf_counter() - started) * 1000:.0f} ms "
+          f"por verificação nesta máquina)", file=sys.stderr)
+    return 0
+
+
+def cmd_shopee_auth(args):
+    manager = get_shared_token_manager()
+    try:
+        if args.code:
+            manager.authorize(args.code)
+        elif args.refresh:
+            manager.get_token()
+    except ShopeeAuthError as exc:
+        print(f"Erro na autorização da Shopee: {exc}")
+        return 1
+    status = manager.status()
+    if not status["has_token"]:
+        print("Nenhum token salvo. Autorize a loja e rode: cli.py shopee-auth --code <code>")
+        return 1
+    print(f"Token da loja {config.SHOPEE_SHOP_ID} vence em {status['expires_in'] // 60} min "
+          f"({config.SHOPEE_TOKEN_FILE}).")
+    return 0
+
+
+def print_metrics():
+    snapshot = db_metrics.snapshot()
+    print("\nMétricas do banco (por função):")
+    print(f"  {'função':<28}{'chamadas':>9}{'erros':>7}{'média ms':>10}{'p95 ms':>9}"
+          f"{'máx ms':>9}{'linhas':>9}{'espera ms':>11}")
+    for name, stats in sorted(snapshot["functions"].items()):
+        print(f"  {name:<28}{stats['calls']:>9}{stats['errors']:>7}{stats['avg_ms']:>10.1f}"
+              f"{stats['p95_ms']:>9.1f}{stats['max_ms']:>9.1f}{stats['rows']:>9}{stats['wait_ms']:>11.1f}")
+    print(f"  Consultas lentas (>{config.DB_SLOW_QUERY_MS:.0f} ms): {snapshot['slow_queries']}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="ERP Shopee - modo sem interface")
+    parser.add_argument("--concurrency", type=int, default=config.SHOPEE_SYNC_WORKERS,
+                        help="requisições simultâneas à Shopee (padrão: SHOPEE_SYNC_WORKERS)")
+    parser.add_argument("--metrics", action="store_true",
+                        help="mostra as métricas do banco ao terminar")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("sync-all", help="reenvia o estoque de todos os anúncios vinculados") \
+        .set_defaults(func=cmd_sync_all)
+    sub.add_parser("reconcile", help="envia só os anúncios com estoque diferente do confirmado") \
+        .set_defaults(func=cmd_reconcile)
+
+    pull = sub.add_parser("pull-orders", help="aplica ao estoque local as vendas/cancelamentos da Shopee")
+    pull.add_argument("--hours", type=int, help="relê as últimas N horas (ignora a marca d'água)")
+    pull.set_defaults(func=cmd_pull_orders)
+
+    pull_stock = sub.add_parser("pull-stock", help="aplica os pedidos e compara o estoque na Shopee com o último confirmado")
+    pull_stock.add_argument("--adopt", action="store_true", help="aplica as diferenças ao estoque local")
+    pull_stock.set_defaults(func=cmd_pull_stock)
+
+    imp = sub.add_parser("import-stock", help="importa estoque de CSV (sku;quantidade) ou XLSX")
+    imp.add_argument("file")
+    imp.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    imp.add_argument("--dry-run", action="store_true", help="só valida, sem gravar")
+    imp.set_defaults(func=cmd_import_stock)
+
+    daemon = sub.add_parser("daemon", help="processo contínuo: drena a outbox e reconcilia")
+    daemon.add_argument("--reconcile-interval", type=int, default=300,
+                        help="segundos entre reconciliações (0 = só drena a outbox)")
+    daemon.add_argument("--pull-interval", type=int, default=config.SHOPEE_PULL_INTERVAL,
+                        help="segundos entre leituras de pedidos da Shopee (0 = desliga)")
+    daemon.set_defaults(func=cmd_daemon)
+
+    mig = sub.add_parser("migrate", help="aplica as migrações de esquema pendentes")
+    mig.add_argument("--status", action="store_true", help="só lista as pendentes")
+    mig.set_defaults(func=cmd_migrate)
+    sub.add_parser("explain", help="EXPLAIN nas consultas quentes; avisa varreduras completas") \
+        .set_defaults(func=cmd_explain)
+    sub.add_parser("hash-password", help="gera o hash de uma senha (ex.: SUPERUSER_PASSWORD)") \
+        .set_defaults(func=cmd_hash_password)
+
+    auth = sub.add_parser("shopee-auth", help="autoriza a loja na Shopee ou mostra a validade do token")
+    auth.add_argument("--code", help="code devolvido pela tela de autorização da Shopee")
+    auth.add_argument("--refresh", action="store_true", help="renova agora se o token estiver vencido")
+    auth.set_defaults(func=cmd_shopee_auth)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    finally:
+        if args.metrics:
+            print_metrics()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,16 +5,71 @@ DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_USER = os.getenv("DB_USER", "root")
 DB_PASS = os.getenv("DB_PASSWORD", "")  
 DB_NAME = os.getenv("DB_NAME", "erp_system")
+
+# Pool de conexões do database.py
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # segundos esperando uma conexão livre
+DB_POOL_PING_INTERVAL = float(os.getenv("DB_POOL_PING_INTERVAL", "10"))  # ping ao emprestar conexões paradas há mais que isso
+# Instrumentação (db_metrics.py): chamadas acima deste tempo vão para o log de consultas lentas
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "500"))
+DB_METRICS_FILE = os.getenv("DB_METRICS_FILE", "")  # ex.: /var/lib/node_exporter/erp.prom (vazio = não grava)
+DB_METRICS_INTERVAL = float(os.getenv("DB_METRICS_INTERVAL", "15"))  # segundos entre gravações do arquivo
+# "1" = aplica as migrações pendentes (migrations.py) ao abrir o pool; "0" = só via 'cli.py migrate'
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "1") == "1"
+
+# Catálogo de produtos em memória (database.py): atraso máximo e recarga completa periódica
+CATALOG_REFRESH_INTERVAL = float(os.getenv("CATALOG_REFRESH_INTERVAL", "5"))  # segundos
+CATALOG_FULL_RELOAD_INTERVAL = float(os.getenv("CATALOG_FULL_RELOAD_INTERVAL", "600"))  # segundos (pega exclusões)
+CATALOG_WATERMARK_OVERLAP = float(os.getenv("CATALOG_WATERMARK_OVERLAP", "30"))  # segundos relidos antes da marca d'água
 SHOPEE_URL = os.getenv("SHOPEE_URL")
 SHOPEE_PARTNER_ID = os.getenv("SHOPEE_PARTNER_ID")
 SHOPEE_PARTNER_KEY = os.getenv("SHOPEE_PARTNER_KEY")
 SHOPEE_SHOP_ID = os.getenv("SHOPEE_SHOP_ID")
+# "1" = não chama a API de verdade (apps ainda não aprovados na Shopee)
+SHOPEE_SIMULATE = os.getenv("SHOPEE_SIMULATE", "1") == "1"
+SHOPEE_TIMEOUT = float(os.getenv("SHOPEE_TIMEOUT", "10"))  # segundos por requisição
+SHOPEE_SYNC_WORKERS = int(os.getenv("SHOPEE_SYNC_WORKERS", "8"))  # requisições simultâneas no envio em lote
+SHOPEE_DEBUG = os.getenv("SHOPEE_DEBUG", "0") == "1"  # "1" = imprime URL e payload de cada requisição
+
+# Token OAuth da loja (shopee_auth.py): cache em disco compartilhado entre processos e renovação antecipada
+SHOPEE_TOKEN_FILE = os.getenv("SHOPEE_TOKEN_FILE", ".shopee_token.json")
+SHOPEE_TOKEN_REFRESH_MARGIN = float(os.getenv("SHOPEE_TOKEN_REFRESH_MARGIN", "900"))  # segundos antes de vencer
+SHOPEE_REFRESH_TOKEN = os.getenv("SHOPEE_REFRESH_TOKEN", "")  # opcional: semente se ainda não houver arquivo
+
+# Limite de requisições por segundo (por path) e retentativas com backoff exponencial
+SHOPEE_QPS = float(os.getenv("SHOPEE_QPS", "10"))
+SHOPEE_QPS_PER_PATH = os.getenv("SHOPEE_QPS_PER_PATH", "")  # ex.: "/api/v2/product/update_stock=5"
+SHOPEE_MAX_RETRIES = int(os.getenv("SHOPEE_MAX_RETRIES", "5"))
+SHOPEE_BACKOFF_BASE = float(os.getenv("SHOPEE_BACKOFF_BASE", "0.5"))  # segundos
+SHOPEE_BACKOFF_MAX = float(os.getenv("SHOPEE_BACKOFF_MAX", "30"))  # segundos
+
+# Coalescência: alterações do mesmo item/modelo que chegam dentro da janela viram um só envio
+SHOPEE_COALESCE_WINDOW = float(os.getenv("SHOPEE_COALESCE_WINDOW", "2"))  # segundos (0 = envia na hora)
+SHOPEE_COALESCE_MAX = int(os.getenv("SHOPEE_COALESCE_MAX", "500"))  # alterações que forçam o envio antes da janela
+
+# Outbox (outbox.py): enquanto envia um lote o despachante renova o atualizado_em das pendências reservadas
+# a cada OUTBOX_HEARTBEAT_INTERVAL segundos; só as sem renovação há OUTBOX_STALE_AFTER segundos (processo
+# encerrado no meio do envio) voltam à fila. Manter STALE_AFTER bem acima do intervalo e do pior caso de uma
+# requisição com retentativas (SHOPEE_MAX_RETRIES x (SHOPEE_TIMEOUT + SHOPEE_BACKOFF_MAX)).
+OUTBOX_STALE_AFTER = float(os.getenv("OUTBOX_STALE_AFTER", "600"))  # segundos
+OUTBOX_HEARTBEAT_INTERVAL = float(os.getenv("OUTBOX_HEARTBEAT_INTERVAL", "60"))  # segundos
+
+# Sincronização de entrada: intervalo (segundos) entre leituras de pedidos da Shopee no daemon
+SHOPEE_PULL_INTERVAL = int(os.getenv("SHOPEE_PULL_INTERVAL", "120"))
 
 # Credenciais padrão para usuários limitados e superusuário
 DEFAULT_LIMITED_USERNAME = os.getenv("DEFAULT_LIMITED_USERNAME", os.getenv("VALID_USERNAME"))
 DEFAULT_LIMITED_PASSWORD = os.getenv("DEFAULT_LIMITED_PASSWORD", os.getenv("VALID_PASSWORD"))
 SUPERUSER_USERNAME = os.getenv("SUPERUSER_USERNAME")
-SUPERUSER_PASSWORD = os.getenv("SUPERUSER_PASSWORD")
+SUPERUSER_PASSWORD = os.getenv("SUPERUSER_PASSWORD")  # de preferência um hash gerado por 'cli.py hash-password'
+
+# Hash de senhas (passwords.py): "pbkdf2_sha256" ou "scrypt". Aumentar o custo só afeta hashes novos;
+# os antigos são refeitos no próximo login de cada usuário.
+PASSWORD_HASH_ALGORITHM = os.getenv("PASSWORD_HASH_ALGORITHM", "pbkdf2_sha256")
+PASSWORD_PBKDF2_ITERATIONS = int(os.getenv("PASSWORD_PBKDF2_ITERATIONS", "600000"))
+PASSWORD_SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", str(2 ** 15)))
+PASSWORD_SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", "8"))
+PASSWORD_SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", "1"))
 
 # Backwards compatibility
 VALID_USERNAME = DEFAULT_LIMITED_USERNAME
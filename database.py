@@ -1,95 +1,570 @@
-import mysql.connector
+import math
+import threading
+import time
+
 from mysql.connector import Error
 import config  # Importa as configurações de conexão que criamos antes
+import db_metrics
+import migrations
+from catalog_cache import ProductCatalog
+from db_pool import ConnectionPool
+from product_columns import ProductColumns
+from query_cache import QueryCache
+from search_index import ProductSearchIndex, narrows, normalize, rank_products, sku_key
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Catálogo de produtos em memória na frente das leituras (listagem, busca, paginação).
+# Sincroniza pelo atualizado_em dos produtos; as escritas deste processo entram na hora.
+_catalog = ProductCatalog()
+_catalog_lock = threading.Lock()
+
+# Índice de busca em memória (SKU/nome sem acentos), alimentado pelo catálogo
+_search_index = ProductSearchIndex()
+
+# Resultados recentes de search_products (ProductColumns), por termo normalizado.
+# Escritas feitas por este processo (update_stock, add_product...) limpam o cache;
+# o TTL cobre as alterações feitas por fora.
+SEARCH_CACHE_SIZE = 64
+SEARCH_CACHE_TTL = 30.0
+_search_cache = QueryCache(max_entries=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+
+
+def get_pool(auto_migrate=None):
+    """
+    Cria (uma única vez) e retorna o pool de conexões compartilhado.
+    Com auto_migrate (padrão: config.DB_AUTO_MIGRATE) as migrações pendentes rodam antes
+    de o pool ficar visível: outras threads esperam no lock em vez de usar o esquema antigo.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = ConnectionPool(
+                    size=config.DB_POOL_SIZE,
+                    timeout=config.DB_POOL_TIMEOUT,
+                    ping_interval=config.DB_POOL_PING_INTERVAL,
+                    host=config.DB_HOST,
+                    user=config.DB_USER,
+                    password=config.DB_PASS,
+                    database=config.DB_NAME
+                )
+                db_metrics.set_pool_stats_source(pool.stats)
+                if config.DB_AUTO_MIGRATE if auto_migrate is None else auto_migrate:
+                    run_migrations(pool)
+                _pool = pool
+    return _pool
+
+
+def get_metrics():
+    """Latência, erros e linhas por função do database.py, mais as métricas do pool."""
+    return db_metrics.snapshot()
+
+
+def get_pool_stats():
+    """Conexões em uso, ociosas e tempo de espera por conexão."""
+    return get_pool().stats()
+
+
+def get_catalog_stats():
+    """Estado do catálogo em memória: produtos, versão e segundos desde a última sincronização."""
+    return {
+        "loaded": _catalog.loaded,
+        "products": len(_catalog),
+        "version": _catalog.version,
+        "age_s": time.monotonic() - _catalog.refreshed_at if _catalog.loaded else None,
+    }
+
+
+@db_metrics.instrumented
+def run_migrations(pool=None):
+    """
+    Aplica as migrações de esquema pendentes. Retorna (aplicadas, puladas) como
+    migrations.migrate, ou None em caso de erro.
+    """
+    if pool is None:
+        conn = get_db_connection()
+    else:
+        # Chamado por get_pool antes de publicar o pool
+        try:
+            conn = pool.acquire()
+        except Error as e:
+            _log_error(f"Erro crítico ao conectar no MySQL: {e}")
+            conn = None
+    if not conn:
+        return None
+    try:
+        applied, skipped = migrations.migrate(conn)
+        for version, description in applied:
+            print(f"Migração {version} aplicada: {description}")
+        for version, description, reason in skipped:
+            print(f"Aviso: migração {version} ({description}) pulada: {reason}")
+        return applied, skipped
+    except (Error, migrations.MigrationError) as e:
+        _log_error(f"Erro ao migrar o esquema do banco: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+# Consultas mais frequentes, conferidas com EXPLAIN por check_query_plans:
+# (nome, SQL, parâmetros, tabelas que podem ser lidas inteiras)
+HOT_QUERIES = [
+    ("listagem de produtos", "{PRODUCT_SELECT} ORDER BY p.id", (), {"p"}),
+    ("produto por SKU", "{PRODUCT_SELECT} WHERE p.sku = %s", ("",), set()),
+    ("catálogo incremental", "{CATALOG_CHANGES_SELECT}", ("2000-01-01", 0, "2000-01-01", 0), set()),
+    ("vínculos Shopee do SKU",
+     "SELECT remote_item_id FROM mapeamento_plataforma "
+     "WHERE produto_sku = %s AND plataforma = 'SHOPEE'", ("",), set()),
+    ("fila da outbox",
+     "SELECT id FROM sync_outbox WHERE status = 'PENDENTE' AND proxima_tentativa <= NOW() "
+     "ORDER BY id LIMIT 200", (), set()),
+]
+
+
+@db_metrics.instrumented
+def check_query_plans():
+    """Roda EXPLAIN nas consultas quentes e retorna avisos de varredura completa ([] = tudo ok)."""
+    conn = get_db_connection()
+    if not conn:
+        return None
+    queries = [(name, sql.format(PRODUCT_SELECT=PRODUCT_SELECT, CATALOG_CHANGES_SELECT=CATALOG_CHANGES_SELECT),
+                params, allowed) for name, sql, params, allowed in HOT_QUERIES]
+    try:
+        return migrations.explain_queries(conn, queries)
+    finally:
+        conn.close()
+
 
 def get_db_connection():
-    """Função utilitária para abrir conexão com segurança."""
+    """
+    Função utilitária para pegar uma conexão com segurança.
+    A conexão vem do pool: conn.close() apenas a devolve para reuso.
+    """
+    pool = get_pool()
+    started = time.perf_counter()
     try:
-        connection = mysql.connector.connect(
-            host=config.DB_HOST,
-            user=config.DB_USER,
-            password=config.DB_PASS,
-            database=config.DB_NAME
-        )
-        return connection
+        return pool.acquire()
     except Error as e:
-        print(f"Erro crítico ao conectar no MySQL: {e}")
+        _log_error(f"Erro crítico ao conectar no MySQL: {e}")
         return None
+    finally:
+        db_metrics.connection_wait(time.perf_counter() - started)
+
+
+def _log_error(message):
+    """Mostra o erro e o conta nas métricas da chamada em andamento (db_metrics)."""
+    db_metrics.failed()
+    print(message)
 
 # --- R (READ) - LER DADOS ---
+# SELECT base das listagens: produto + ID da Shopee (se houver mapeamento)
+PRODUCT_SELECT = """
+    SELECT p.id, p.sku, p.nome, p.estoque_real, m.remote_item_id as shopee_id
+    FROM produtos p
+    LEFT JOIN mapeamento_plataforma m ON p.sku = m.produto_sku AND m.plataforma = 'SHOPEE'
+"""
+
+# Mesma listagem com o carimbo de alteração usado na sincronização do catálogo
+# (o mais recente entre o do produto e o do vínculo com a Shopee)
+CATALOG_SELECT = """
+    SELECT p.id, p.sku, p.nome, p.estoque_real, m.remote_item_id as shopee_id,
+           GREATEST(p.atualizado_em, COALESCE(m.atualizado_em, p.atualizado_em)) AS atualizado_em
+    FROM produtos p
+    LEFT JOIN mapeamento_plataforma m ON p.sku = m.produto_sku AND m.plataforma = 'SHOPEE'
+"""
+
+# Incremental: produtos alterados ou com vínculo alterado (UNION: cada lado usa o seu índice)
+CATALOG_CHANGES_SELECT = f"""
+    {CATALOG_SELECT} WHERE p.atualizado_em >= %s - INTERVAL %s SECOND
+    UNION
+    {CATALOG_SELECT} WHERE m.atualizado_em >= %s - INTERVAL %s SECOND
+"""
+
+PAGE_SIZE = 500
+BULK_CHUNK_SIZE = 1000
+
+
+def _search_filter(term):
+    """Cláusula WHERE (sem a palavra WHERE) e parâmetros da busca por SKU/nome."""
+    like_term = f"%{term}%"
+    return "(p.sku LIKE %s OR p.nome LIKE %s)", [like_term, like_term]
+
+
+@db_metrics.instrumented
 def get_all_products():
     """
     Retorna uma lista com todos os produtos e seus dados.
     Faz um JOIN para trazer também o ID da Shopee se existir.
     """
+    catalog = _fresh_catalog()
+    if catalog is not None:
+        return catalog.rows()
+
     conn = get_db_connection()
     resultados = []
     
     if conn:
+        cursor = None
         try:
             # dictionary=True faz o banco devolver dados como {'nome': 'Camisa'} ao invés de listas [1, 'Camisa']
             cursor = conn.cursor(dictionary=True) 
             
-            query = """
-                SELECT p.id, p.sku, p.nome, p.estoque_real, m.remote_item_id as shopee_id 
-                FROM produtos p
-                LEFT JOIN mapeamento_plataforma m ON p.sku = m.produto_sku AND m.plataforma = 'SHOPEE'
-            """
-            cursor.execute(query)
+            cursor.execute(PRODUCT_SELECT)
             resultados = cursor.fetchall()
             
         except Error as e:
-            print(f"Erro ao ler produtos: {e}")
+            _log_error(f"Erro ao ler produtos: {e}")
             
         finally:
-            # O bloco finally garante que a conexão fecha mesmo se der erro
-            if conn.is_connected():
+            # O bloco finally garante que a conexão volta ao pool mesmo se der erro
+            if cursor is not None:
                 cursor.close()
-                conn.close()
+            conn.close()
                 
     return resultados
 
 
-def search_products(term):
-    """Retorna produtos cujo SKU ou nome contém o termo informado."""
+@db_metrics.instrumented
+def refresh_catalog(full=False, max_age=None):
+    """
+    Sincroniza o catálogo em memória com o banco.
+    Normalmente traz só os produtos cujo atualizado_em (ou o do vínculo com a Shopee) é
+    >= o maior já visto menos CATALOG_WATERMARK_OVERLAP segundos (linhas gravadas por
+    transações longas chegam com um atualizado_em anterior ao commit; as que já estão iguais
+    no cache são ignoradas). A carga completa acontece na primeira vez, com full=True e a
+    cada CATALOG_FULL_RELOAD_INTERVAL segundos (é ela que remove produtos apagados por fora).
+    Com 'max_age', não faz nada se a última sincronização tiver menos que isso (conferido
+    já com o lock: quem esperou outra thread sincronizar não repete a consulta).
+    Retorna False se o banco não respondeu.
+    """
+    global _search_index
+    with _catalog_lock:
+        if (not full and max_age is not None and _catalog.loaded
+                and time.monotonic() - _catalog.refreshed_at < max_age):
+            return True
+        conn = get_db_connection()
+        if not conn:
+            return False
+
+        full = (full or not _catalog.loaded or _catalog.watermark is None
+                or time.monotonic() - _catalog.loaded_at >= config.CATALOG_FULL_RELOAD_INTERVAL)
+        cursor = None
+        try:
+            cursor = conn.cursor(dictionary=True)
+            if not full:
+                overlap = int(config.CATALOG_WATERMARK_OVERLAP)
+                cursor.execute(CATALOG_CHANGES_SELECT,
+                               (_catalog.watermark, overlap, _catalog.watermark, overlap))
+                rows = list({row['id']: row for row in cursor.fetchall()}.values())
+                db_metrics.add_rows(len(rows))
+                watermark = max((row['atualizado_em'] for row in rows), default=None)
+                changed = _catalog.apply(rows, watermark)
+                for record in changed:
+                    _search_index.add(record.id, record.sku, record.nome)
+                if changed:
+                    _search_cache.clear()
+
+            if full:
+                cursor.execute(f"{CATALOG_SELECT} ORDER BY p.id")
+                rows = cursor.fetchall()
+                db_metrics.add_rows(len(rows))
+                watermark = max((row['atualizado_em'] for row in rows), default=None)
+                records = _catalog.load(rows, watermark)
+
+                # Índice novo montado à parte: buscas em andamento continuam usando o antigo
+                index = ProductSearchIndex()
+                for record in records:
+                    index.add(record.id, record.sku, record.nome)
+                _search_index = index
+                _search_cache.clear()
+            return True
+
+        except Error as e:
+            _log_error(f"Erro ao sincronizar catálogo de produtos: {e}")
+            return False
+
+        finally:
+            if cursor is not None:
+                cursor.close()
+            conn.close()
+
+
+def _fresh_catalog():
+    """
+    Catálogo em memória com no máximo CATALOG_REFRESH_INTERVAL segundos de atraso,
+    ou None se ainda não foi possível carregá-lo (as leituras caem no SQL).
+    """
+    if not _catalog.loaded or time.monotonic() - _catalog.refreshed_at >= config.CATALOG_REFRESH_INTERVAL:
+        refresh_catalog(max_age=config.CATALOG_REFRESH_INTERVAL)
+    return _catalog if _catalog.loaded else None
+
+
+def rebuild_search_index():
+    """Recarrega catálogo e índice do zero (ex.: muitas alterações feitas fora do sistema)."""
+    refresh_catalog(full=True)
+
+
+@db_metrics.instrumented
+def get_products_by_ids(ids):
+    """Retorna os produtos dos ids informados (em qualquer ordem)."""
+    ids = list(ids)
+    resultados = []
+    if not ids:
+        return resultados
+
+    catalog = _fresh_catalog()
+    if catalog is not None:
+        return catalog.rows(ids)
+
+    conn = get_db_connection()
+    if conn:
+        cursor = None
+        try:
+            cursor = conn.cursor(dictionary=True)
+            for start in range(0, len(ids), BULK_CHUNK_SIZE):
+                chunk = ids[start:start + BULK_CHUNK_SIZE]
+                placeholders = ", ".join(["%s"] * len(chunk))
+                cursor.execute(f"{PRODUCT_SELECT} WHERE p.id IN ({placeholders})", chunk)
+                resultados.extend(cursor.fetchall())
+
+        except Error as e:
+            _log_error(f"Erro ao ler produtos por id: {e}")
+
+        finally:
+            if cursor is not None:
+                cursor.close()
+            conn.close()
+
+    return resultados
+
+
+@db_metrics.instrumented
+def get_product_by_sku(sku):
+    """Retorna o produto do SKU (comparado pela collation da coluna) ou None."""
+    catalog = _fresh_catalog()
+    if catalog is not None:
+        record = catalog.get_by_sku(sku)
+        return record.as_dict() if record is not None else None
+
+    conn = get_db_connection()
+    produto = None
+
+    if conn:
+        cursor = None
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f"{PRODUCT_SELECT} WHERE p.sku = %s", (sku,))
+            produto = cursor.fetchone()
+            cursor.fetchall()  # Mais de um vínculo Shopee: descarta o resto
+
+        except Error as e:
+            _log_error(f"Erro ao ler produto por SKU: {e}")
+
+        finally:
+            if cursor is not None:
+                cursor.close()
+            conn.close()
+
+    return produto
+
+
+@db_metrics.instrumented
+def get_products_columns(ids=None):
+    """
+    Como get_all_products (ou get_products_by_ids, mantendo a ordem de 'ids'), mas em
+    ProductColumns: colunas compactas em vez de um dict por produto (catálogos grandes).
+    """
+    catalog = _fresh_catalog()
+    if catalog is not None:
+        return catalog.columns(ids)
+
+    if ids is None:
+        return ProductColumns.from_rows(get_all_products())
+    rows_by_id = {row['id']: row for row in get_products_by_ids(ids)}
+    return ProductColumns.from_rows(rows_by_id[i] for i in ids if i in rows_by_id)
+
+
+@db_metrics.instrumented
+def search_products(term, limit=None, columnar=False):
+    """
+    Retorna produtos cujo SKU ou nome casa com o termo, do mais para o menos relevante.
+    A busca roda no índice em memória (sem acentos, por prefixo de palavra) e as linhas
+    vêm do catálogo em memória, sem varrer a tabela com LIKE '%termo%'.
+    Com columnar=True devolve ProductColumns em vez de lista de dicts.
+    """
+    def deliver(columns):
+        return columns.copy() if columnar else columns.to_dicts()
+
     if not term:
-        return get_all_products()
+        return get_products_columns() if columnar else get_all_products()
+
+    cache_key = normalize(term).strip()
+    if limit is None:
+        cached = _search_cache.get(cache_key)
+        if cached is not None:
+            return deliver(cached)
+
+        # Termo mais específico que um já em cache (ex.: 'cami' -> 'camisa'):
+        # filtra o resultado guardado em memória sem voltar ao banco
+        broader = [(rows, stored_at) for key, rows, stored_at in _search_cache.items()
+                   if narrows(term, key)]
+        if broader:
+            rows, stored_at = min(broader, key=lambda item: len(item[0]))
+            resultados = ProductColumns.from_rows(rank_products(term, rows))
+            _search_cache.put(cache_key, resultados, stored_at)
+            return deliver(resultados)
+
+    _fresh_catalog()
+    ids = _search_index.search(term, limit)
+    resultados = get_products_columns(ids)
+    if len(resultados) < len(ids):
+        for product_id in set(ids).difference(resultados.ids):
+            _search_index.remove(product_id)  # Produto apagado do banco
+
+    if limit is None:
+        _search_cache.put(cache_key, resultados)
+    return deliver(resultados)
+
+
+def invalidate_search_cache():
+    """Descarta os resultados de busca em cache (chamado após qualquer escrita)."""
+    _search_cache.clear()
+
+
+@db_metrics.instrumented
+def get_products_page(after_id=0, limit=PAGE_SIZE, term=None):
+    """
+    Retorna uma página de produtos com id > after_id, ordenada por id (paginação por chave).
+    Para pegar a próxima página, passe o id do último produto recebido.
+    Diferente de OFFSET, o custo de cada página não cresce com o tamanho do catálogo.
+    """
+    catalog = _fresh_catalog()
+    if catalog is not None:
+        return catalog.page(after_id, int(limit), term)
 
     conn = get_db_connection()
     resultados = []
 
     if conn:
+        cursor = None
         try:
             cursor = conn.cursor(dictionary=True)
-            like_term = f"%{term}%"
-            query = """
-                SELECT p.id, p.sku, p.nome, p.estoque_real, m.remote_item_id as shopee_id
-                FROM produtos p
-                LEFT JOIN mapeamento_plataforma m ON p.sku = m.produto_sku AND m.plataforma = 'SHOPEE'
-                WHERE p.sku LIKE %s OR p.nome LIKE %s
-            """
-            cursor.execute(query, (like_term, like_term))
+            conditions = ["p.id > %s"]
+            params = [after_id]
+            if term:
+                where, term_params = _search_filter(term)
+                conditions.append(where)
+                params.extend(term_params)
+
+            query = f"{PRODUCT_SELECT} WHERE {' AND '.join(conditions)} ORDER BY p.id LIMIT %s"
+            params.append(int(limit))
+            cursor.execute(query, params)
             resultados = cursor.fetchall()
 
         except Error as e:
-            print(f"Erro na busca de produtos: {e}")
+            _log_error(f"Erro ao ler página de produtos: {e}")
 
         finally:
-            if conn.is_connected():
+            if cursor is not None:
                 cursor.close()
-                conn.close()
+            conn.close()
 
     return resultados
 
+
+def iter_products(term=None, page_size=PAGE_SIZE):
+    """
+    Gerador que percorre o catálogo (ou o resultado da busca) página por página.
+    Só uma página fica em memória por vez e a conexão volta ao pool entre as páginas.
+    """
+    after_id = 0
+    while True:
+        page = get_products_page(after_id, page_size, term)
+        if not page:
+            return
+        yield from page
+        if len(page) < page_size:
+            return
+        after_id = page[-1]['id']
+
+
+@db_metrics.instrumented
+def count_products(term=None):
+    """Conta os produtos (ou os resultados da busca) sem trazer as linhas."""
+    catalog = _fresh_catalog()
+    if catalog is not None:
+        return catalog.count(term)
+
+    conn = get_db_connection()
+    total = 0
+
+    if conn:
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            if term:
+                where, params = _search_filter(term)
+                cursor.execute(f"SELECT COUNT(*) FROM produtos p WHERE {where}", params)
+            else:
+                cursor.execute("SELECT COUNT(*) FROM produtos")
+            total = cursor.fetchone()[0]
+
+        except Error as e:
+            _log_error(f"Erro ao contar produtos: {e}")
+
+        finally:
+            if cursor is not None:
+                cursor.close()
+            conn.close()
+
+    return total
+
+@db_metrics.instrumented
+def get_all_skus():
+    """Conjunto com todos os SKUs cadastrados (usado para validar importações)."""
+    catalog = _fresh_catalog()
+    if catalog is not None:
+        return catalog.skus()
+
+    conn = get_db_connection()
+    skus = set()
+
+    if conn:
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT sku FROM produtos")
+            while True:
+                rows = cursor.fetchmany(10000)
+                if not rows:
+                    break
+                skus.update(row[0] for row in rows)
+
+        except Error as e:
+            _log_error(f"Erro ao ler SKUs: {e}")
+
+        finally:
+            if cursor is not None:
+                cursor.close()
+            conn.close()
+
+    return skus
+
 # --- U (UPDATE) - ATUALIZAR DADOS ---
-def update_stock(sku, new_quantity):
+@db_metrics.instrumented
+def update_stock(sku, new_quantity, enqueue_sync=True):
     """
     Atualiza a quantidade de estoque de um SKU específico no banco local.
+    Com enqueue_sync=True, registra na sync_outbox (na mesma transação) o envio
+    do novo estoque para os anúncios vinculados ao SKU.
     """
     conn = get_db_connection()
     sucesso = False
     
     if conn:
+        cursor = None
         try:
             cursor = conn.cursor()
             # O %s é vital para evitar SQL Injection (segurança)
@@ -97,44 +572,804 @@ def update_stock(sku, new_quantity):
             
             # Passamos os valores numa tupla (valor, sku)
             cursor.execute(sql, (new_quantity, sku))
-            conn.commit() # Salva a alteração permanentemente
+            db_metrics.add_rows(cursor.rowcount)
             
             if cursor.rowcount > 0:
+                if enqueue_sync:
+                    # Mesma transação: ou grava estoque + pendência de sync, ou nada
+                    cursor.execute(OUTBOX_ENQUEUE_SQL, (new_quantity, sku))
+                conn.commit() # Salva a alteração permanentemente
                 sucesso = True
+                _catalog.set_stock(sku, new_quantity)
+                invalidate_search_cache()
             else:
+                conn.rollback()
                 print(f"Aviso: SKU '{sku}' não encontrado no banco.")
                 
         except Error as e:
-            print(f"Erro ao atualizar estoque: {e}")
+            conn.rollback()
+            _log_error(f"Erro ao atualizar estoque: {e}")
             
         finally:
-            if conn.is_connected():
+            if cursor is not None:
                 cursor.close()
-                conn.close()
+            conn.close()
                 
     return sucesso
 
+
+@db_metrics.instrumented
+def update_stock_bulk(changes, chunk_size=BULK_CHUNK_SIZE, enqueue_sync=True):
+    """
+    Atualiza o estoque de muitos SKUs de uma vez, numa única transação.
+    'changes' é um iterável de pares (sku, quantidade); se o mesmo SKU aparecer
+    mais de uma vez (comparando como o MySQL: sem diferenciar maiúsculas nem acentos),
+    vale a última quantidade.
+
+    Os pares vão em lotes (executemany) para uma tabela temporária e um único
+    UPDATE ... JOIN aplica tudo; com enqueue_sync=True os envios para a Shopee entram
+    na sync_outbox na mesma transação. Retorna {"encontrados": [...], "nao_encontrados": [...]}
+    ou None se a transação falhar (nada é gravado nesse caso).
+    """
+    # 'abc1' e 'ABC1 ' são o mesmo SKU para a collation da coluna (sku_key)
+    # e colidiriam na PRIMARY KEY da tabela temporária
+    latest = {}
+    for sku, qty in changes:
+        sku = str(sku).strip()
+        latest[sku_key(sku)] = (sku, int(qty))  # A última grafia e quantidade valem
+
+    resultado = {"encontrados": [], "nao_encontrados": []}
+    if not latest:
+        return resultado
+
+    conn = get_db_connection()
+    if not conn:
+        return None
+
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        # A tabela temporária copia o tipo/collation das colunas de 'produtos'
+        cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_estoque_bulk")
+        cursor.execute("""
+            CREATE TEMPORARY TABLE tmp_estoque_bulk (PRIMARY KEY (sku))
+            SELECT sku, estoque_real AS estoque FROM produtos LIMIT 0
+        """)
+
+        items = list(latest.values())
+        sql = "INSERT INTO tmp_estoque_bulk (sku, estoque) VALUES (%s, %s)"
+        for start in range(0, len(items), chunk_size):
+            cursor.executemany(sql, items[start:start + chunk_size])
+
+        cursor.execute("""
+            UPDATE produtos p
+            JOIN tmp_estoque_bulk t ON p.sku = t.sku
+            SET p.estoque_real = t.estoque
+        """)
+
+        if enqueue_sync:
+            cursor.execute("""
+                INSERT INTO sync_outbox (plataforma, produto_sku, remote_item_id, quantidade)
+                SELECT m.plataforma, m.produto_sku, m.remote_item_id, t.estoque
+                FROM tmp_estoque_bulk t
+                JOIN mapeamento_plataforma m ON m.produto_sku = t.sku AND m.plataforma = 'SHOPEE'
+                WHERE m.remote_item_id IS NOT NULL
+            """)
+
+        cursor.execute("""
+            SELECT t.sku, p.sku IS NOT NULL
+            FROM tmp_estoque_bulk t
+            LEFT JOIN produtos p ON p.sku = t.sku
+        """)
+        for sku, found in cursor.fetchall():
+            resultado["encontrados" if found else "nao_encontrados"].append(sku)
+
+        conn.commit()
+        for sku in resultado["encontrados"]:
+            _catalog.set_stock(sku, latest[sku_key(sku)][1])
+        invalidate_search_cache()
+
+    except Error as e:
+        _log_error(f"Erro na atualização em lote de estoque: {e}")
+        conn.rollback()
+        resultado = None
+
+    finally:
+        if cursor is not None:
+            try:
+                cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_estoque_bulk")
+            except Error:
+                pass
+            cursor.close()
+        conn.close()
+
+    return resultado
+
 # --- C (CREATE) - INSERIR DADOS ---
+@db_metrics.instrumented
 def add_product(sku, nome, preco, estoque):
     """Insere um novo produto no banco de dados."""
     conn = get_db_connection()
     
     if conn:
+        cursor = None
         try:
             cursor = conn.cursor()
             sql = "INSERT INTO produtos (sku, nome, preco, estoque_real) VALUES (%s, %s, %s, %s)"
             cursor.execute(sql, (sku, nome, preco, estoque))
             conn.commit()
+            _catalog.put(cursor.lastrowid, sku, nome, estoque)
+            _search_index.add(cursor.lastrowid, sku, nome)
+            invalidate_search_cache()
             print(f"Produto '{nome}' adicionado com sucesso!")
             return True
             
         except Error as e:
-            print(f"Erro ao inserir produto: {e}")
+            _log_error(f"Erro ao inserir produto: {e}")
             return False
             
         finally:
-            if conn.is_connected():
+            if cursor is not None:
                 cursor.close()
-                conn.close()
+            conn.close()
                 
-    return False
\ No newline at end of file
+    return False
+
+
+def _normalize_product_row(row):
+    """Aceita dict ou tupla (sku, nome, preco, estoque[, shopee_id]). Retorna (dados, erro)."""
+    if isinstance(row, dict):
+        sku, nome = row.get('sku'), row.get('nome')
+        preco, estoque, shopee_id = row.get('preco'), row.get('estoque'), row.get('shopee_id')
+    else:
+        row = tuple(row)
+        if len(row) < 4:
+            return None, "linha incompleta (esperado sku, nome, preço, estoque)"
+        sku, nome, preco, estoque, *rest = row
+        shopee_id = rest[0] if rest else None
+
+    sku = str(sku or "").strip()
+    nome = str(nome or "").strip()
+    if not sku:
+        return None, "SKU vazio"
+    if not nome:
+        return None, "nome vazio"
+    try:
+        preco = round(float(str(preco).replace(",", ".")), 2)
+        estoque = int(estoque)
+        shopee_id = int(shopee_id) if shopee_id not in (None, "", "---") else None
+    except (TypeError, ValueError):
+        return None, "preço, estoque ou ID Shopee inválido"
+    if not math.isfinite(preco):
+        return None, "preço inválido"
+    if preco < 0 or estoque < 0:
+        return None, "preço e estoque não podem ser negativos"
+    return (sku, nome, preco, estoque, shopee_id), None
+
+
+@db_metrics.instrumented
+def add_products_bulk(products, chunk_size=BULK_CHUNK_SIZE, update_existing=True):
+    """
+    Cadastra muitos produtos de uma vez, em transações de 'chunk_size' linhas.
+    'products' é um iterável de dicts {'sku', 'nome', 'preco', 'estoque', 'shopee_id'?}
+    ou tuplas (sku, nome, preco, estoque[, shopee_id]).
+
+    SKUs novos são inseridos e, com update_existing=True, os existentes são atualizados;
+    quem tiver shopee_id ganha (ou atualiza) a linha em mapeamento_plataforma no mesmo lote.
+    Retorna {"inseridos": [...], "atualizados": [...], "rejeitados": [(sku, motivo), ...]}.
+    """
+    resultado = {"inseridos": [], "atualizados": [], "rejeitados": []}
+    if not _unique_sku_enforced():
+        # Sem o índice único, lotes concorrentes podem cadastrar o mesmo SKU duas vezes
+        motivo = f"migração {migrations.UNIQUE_SKU_VERSION} (SKU único) pendente: rode 'python cli.py migrate'"
+        for row in products:
+            sku = row.get('sku') if isinstance(row, dict) else (row[0] if row else None)
+            resultado["rejeitados"].append((sku, motivo))
+        return resultado
+
+    chunk, seen = [], set()
+    for row in products:
+        data, error = _normalize_product_row(row)
+        if error:
+            sku = row.get('sku') if isinstance(row, dict) else (row[0] if row else None)
+            resultado["rejeitados"].append((sku, error))
+            continue
+        if sku_key(data[0]) in seen:
+            resultado["rejeitados"].append((data[0], "SKU repetido no lote"))
+            continue
+        seen.add(sku_key(data[0]))
+        chunk.append(data)
+        if len(chunk) >= chunk_size:
+            _add_products_chunk(chunk, update_existing, resultado)
+            chunk = []
+
+    if chunk:
+        _add_products_chunk(chunk, update_existing, resultado)
+
+    if resultado["inseridos"] or resultado["atualizados"]:
+        invalidate_search_cache()
+    return resultado
+
+
+_unique_sku_ready = False
+
+
+def _unique_sku_enforced():
+    """True se a migração do SKU único já foi aplicada (consulta o banco até que seja)."""
+    global _unique_sku_ready
+    if not _unique_sku_ready:
+        conn = get_db_connection()
+        if not conn:
+            return False
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            _unique_sku_ready = migrations.UNIQUE_SKU_VERSION in migrations.applied_versions(cursor)
+        except Error as e:
+            _log_error(f"Erro ao consultar a versão do esquema: {e}")
+        finally:
+            if cursor is not None:
+                cursor.close()
+            conn.close()
+    return _unique_sku_ready
+
+
+def _add_products_chunk(chunk, update_existing, resultado):
+    conn = get_db_connection()
+    if not conn:
+        resultado["rejeitados"].extend((row[0], "sem conexão com o banco") for row in chunk)
+        return
+
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        skus = [row[0] for row in chunk]
+        placeholders = ", ".join(["%s"] * len(skus))
+
+        cursor.execute(f"SELECT id, sku FROM produtos WHERE sku IN ({placeholders})", skus)
+        existing = {sku_key(sku): product_id for product_id, sku in cursor.fetchall()}
+        cursor.execute(
+            f"SELECT produto_sku FROM mapeamento_plataforma "
+            f"WHERE plataforma = 'SHOPEE' AND produto_sku IN ({placeholders})", skus
+        )
+        mapped = {sku_key(row[0]) for row in cursor.fetchall()}
+
+        new_rows = [row for row in chunk if sku_key(row[0]) not in existing]
+        old_rows = [row for row in chunk if sku_key(row[0]) in existing]
+        if not update_existing:
+            resultado["rejeitados"].extend((row[0], "SKU já cadastrado") for row in old_rows)
+            old_rows = []
+
+        if new_rows:
+            cursor.executemany(
+                """INSERT INTO produtos (sku, nome, preco, estoque_real) VALUES (%s, %s, %s, %s)
+                   ON DUPLICATE KEY UPDATE nome = VALUES(nome), preco = VALUES(preco),
+                                           estoque_real = VALUES(estoque_real)""",
+                [row[:4] for row in new_rows]
+            )
+        if old_rows:
+            cursor.executemany(
+                "UPDATE produtos SET nome = %s, preco = %s, estoque_real = %s WHERE sku = %s",
+                [(nome, preco, estoque, sku) for sku, nome, preco, estoque, _ in old_rows]
+            )
+
+        written = new_rows + old_rows
+        mapping_new = [(row[0], row[4]) for row in written
+                       if row[4] is not None and sku_key(row[0]) not in mapped]
+        mapping_old = [(row[4], row[0]) for row in written
+                       if row[4] is not None and sku_key(row[0]) in mapped]
+        if mapping_new:
+            cursor.executemany(
+                "INSERT INTO mapeamento_plataforma (produto_sku, plataforma, remote_item_id) "
+                "VALUES (%s, 'SHOPEE', %s)", mapping_new
+            )
+        if mapping_old:
+            cursor.executemany(
+                "UPDATE mapeamento_plataforma SET remote_item_id = %s "
+                "WHERE produto_sku = %s AND plataforma = 'SHOPEE'", mapping_old
+            )
+
+        # Estoque de produtos já vinculados mudou: agenda o envio na mesma transação
+        if old_rows:
+            cursor.executemany(OUTBOX_ENQUEUE_SQL, [(row[3], row[0]) for row in old_rows])
+
+        # Ids gerados para os novos (alimentam catálogo e índice de busca)
+        if new_rows:
+            new_placeholders = ", ".join(["%s"] * len(new_rows))
+            cursor.execute(f"SELECT id, sku FROM produtos WHERE sku IN ({new_placeholders})",
+                           [row[0] for row in new_rows])
+            existing.update((sku_key(sku), product_id) for product_id, sku in cursor.fetchall())
+
+        conn.commit()
+
+        resultado["inseridos"].extend(row[0] for row in new_rows)
+        resultado["atualizados"].extend(row[0] for row in old_rows)
+        for sku, nome, _, estoque, shopee_id in written:
+            product_id = existing.get(sku_key(sku))
+            if product_id is None:
+                continue
+            if shopee_id is None:
+                current = _catalog.get(product_id)
+                shopee_id = current.shopee_id if current else None
+            _catalog.put(product_id, sku, nome, estoque, shopee_id)
+            _search_index.add(product_id, sku, nome)
+
+    except Error as e:
+        conn.rollback()
+        _log_error(f"Erro no cadastro em lote: {e}")
+        resultado["rejeitados"].extend((row[0], str(e)) for row in chunk)
+
+    finally:
+        if cursor is not None:
+            cursor.close()
+        conn.close()
+
+
+# --- OUTBOX - FILA DE SINCRONIZAÇÃO COM MARKETPLACES ---
+# Cada alteração de estoque de um SKU vinculado gera uma linha aqui, na mesma transação
+# da escrita local. O OutboxDispatcher (outbox.py) envia em lotes e tenta de novo as falhas.
+OUTBOX_ENQUEUE_SQL = """
+    INSERT INTO sync_outbox (plataforma, produto_sku, remote_item_id, quantidade)
+    SELECT m.plataforma, m.produto_sku, m.remote_item_id, %s
+    FROM mapeamento_plataforma m
+    WHERE m.produto_sku = %s AND m.plataforma = 'SHOPEE' AND m.remote_item_id IS NOT NULL
+"""
+
+
+def _execute_write(sql_list, action):
+    """Executa [(sql, params ou lista de params), ...] numa transação. Retorna True/False."""
+    conn = get_db_connection()
+    if not conn:
+        return False
+
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        for sql, params in sql_list:
+            if isinstance(params, list):
+                if not params:
+                    continue
+                cursor.executemany(sql, params)
+            else:
+                cursor.execute(sql, params)
+            db_metrics.add_rows(cursor.rowcount)
+        conn.commit()
+        return True
+
+    except Error as e:
+        conn.rollback()
+        _log_error(f"Erro ao {action}: {e}")
+        return False
+
+    finally:
+        if cursor is not None:
+            cursor.close()
+        conn.close()
+
+
+OUTBOX_CLAIM_LOCK = "erp_outbox_claim"
+OUTBOX_CLAIM_LOCK_TIMEOUT = 5  # segundos esperando outro despachante terminar de reservar
+
+
+@db_metrics.instrumented
+def claim_outbox_batch(limit=200):
+    """
+    Reserva até 'limit' pendências vencidas (status PENDENTE -> PROCESSANDO) e as retorna.
+    SKIP LOCKED deixa vários despachantes trabalharem sem pegar a mesma linha, e itens com
+    pendência em PROCESSANDO ficam de fora: dois despachantes (GUI e cli.py daemon) nunca
+    enviam o mesmo item ao mesmo tempo, o que deixaria um valor antigo vencer a corrida.
+    As reservas são serializadas por um lock nomeado para que cada uma já enxergue o
+    PROCESSANDO gravado pela anterior.
+    """
+    conn = get_db_connection()
+    jobs = []
+
+    if conn:
+        cursor = None
+        locked = False
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT GET_LOCK(%s, %s) AS ok", (OUTBOX_CLAIM_LOCK, OUTBOX_CLAIM_LOCK_TIMEOUT))
+            locked = cursor.fetchone()['ok'] == 1
+            if not locked:
+                return []  # Outro despachante está reservando; tenta na próxima rodada
+            conn.commit()  # Começa uma transação nova, que já vê as reservas anteriores
+
+            cursor.execute("""
+                SELECT o.id, o.plataforma, o.produto_sku, o.remote_item_id, o.remote_model_id,
+                       o.quantidade, o.tentativas
+                FROM sync_outbox o
+                WHERE o.status = 'PENDENTE' AND o.proxima_tentativa <= NOW()
+                  AND NOT EXISTS (
+                      SELECT 1 FROM sync_outbox em_envio
+                      WHERE em_envio.remote_item_id = o.remote_item_id
+                        AND em_envio.status = 'PROCESSANDO'
+                  )
+                ORDER BY o.id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, (int(limit),))
+            jobs = cursor.fetchall()
+
+            if jobs:
+                placeholders = ", ".join(["%s"] * len(jobs))
+                cursor.execute(
+                    f"UPDATE sync_outbox SET status = 'PROCESSANDO', tentativas = tentativas + 1 "
+                    f"WHERE id IN ({placeholders})",
+                    [job['id'] for job in jobs]
+                )
+            conn.commit()
+
+        except Error as e:
+            conn.rollback()
+            jobs = []
+            _log_error(f"Erro ao reservar pendências da outbox: {e}")
+
+        finally:
+            if cursor is not None:
+                if locked:
+                    try:
+                        cursor.execute("SELECT RELEASE_LOCK(%s)", (OUTBOX_CLAIM_LOCK,))
+                        cursor.fetchall()
+                    except Error:
+                        pass  # O lock cai junto com a sessão
+                cursor.close()
+            conn.close()
+
+    return jobs
+
+
+@db_metrics.instrumented
+def complete_outbox_jobs(jobs):
+    """
+    Marca as pendências como ENVIADO e grava no mapeamento o estoque que a Shopee aceitou.
+    Pendências mais antigas do mesmo item/modelo que ainda estejam na fila também são
+    dadas como enviadas (o valor novo já foi).
+    """
+    if not jobs:
+        return True
+    ids = [(job['id'],) for job in jobs]
+    superseded = [(job['remote_item_id'], job['remote_model_id'], job['id']) for job in jobs]
+
+    # Último valor aceito por anúncio (jobs vêm em ordem de id): base da sincronização por delta
+    latest = {}
+    for job in jobs:
+        latest[(job['plataforma'], job['produto_sku'], job['remote_item_id'])] = job['quantidade']
+    confirmed = [(qty, plataforma, sku, item_id) for (plataforma, sku, item_id), qty in latest.items()]
+
+    return _execute_write([
+        ("UPDATE sync_outbox SET status = 'ENVIADO', ultimo_erro = NULL WHERE id = %s", ids),
+        ("""UPDATE sync_outbox SET status = 'ENVIADO'
+            WHERE remote_item_id = %s AND remote_model_id = %s AND id < %s
+              AND status IN ('PENDENTE', 'ERRO')""", superseded),
+        (CONFIRM_REMOTE_STOCK_SQL, confirmed),
+    ], "concluir pendências da outbox")
+
+
+@db_metrics.instrumented
+def fail_outbox_jobs(failures, max_attempts, retry_delays):
+    """
+    Devolve pendências que falharam para a fila, com espera crescente.
+    'failures' é uma lista de (job, mensagem de erro); 'retry_delays(job)' dá os segundos
+    até a próxima tentativa. Quem esgotou 'max_attempts' fica com status ERRO.
+    """
+    if not failures:
+        return True
+    params = []
+    for job, error in failures:
+        status = 'ERRO' if job['tentativas'] + 1 >= max_attempts else 'PENDENTE'
+        params.append((status, str(error)[:1000], int(retry_delays(job)), job['id']))
+    return _execute_write([
+        ("""UPDATE sync_outbox
+            SET status = %s, ultimo_erro = %s,
+                proxima_tentativa = NOW() + INTERVAL %s SECOND
+            WHERE id = %s""", params),
+    ], "registrar falhas da outbox")
+
+
+@db_metrics.instrumented
+def touch_outbox_jobs(ids):
+    """Renova o atualizado_em das pendências ainda em PROCESSANDO (lote em envio não é dado como preso)."""
+    ids = list(ids)
+    if not ids:
+        return True
+    placeholders = ", ".join(["%s"] * len(ids))
+    return _execute_write([
+        (f"UPDATE sync_outbox SET atualizado_em = NOW() "
+         f"WHERE status = 'PROCESSANDO' AND id IN ({placeholders})", tuple(ids)),
+    ], "renovar pendências em envio da outbox")
+
+
+@db_metrics.instrumented
+def release_stale_outbox_jobs(older_than_seconds=None):
+    """
+    Pendências presas em PROCESSANDO (processo encerrado no meio do envio) voltam à fila.
+    Presa = sem renovação (touch_outbox_jobs) há mais de config.OUTBOX_STALE_AFTER segundos.
+    """
+    if older_than_seconds is None:
+        older_than_seconds = config.OUTBOX_STALE_AFTER
+    return _execute_write([
+        ("""UPDATE sync_outbox SET status = 'PENDENTE'
+            WHERE status = 'PROCESSANDO' AND atualizado_em < NOW() - INTERVAL %s SECOND""",
+         (int(older_than_seconds),)),
+    ], "liberar pendências presas da outbox")
+
+
+# --- SINCRONIZAÇÃO POR DELTA ---
+# mapeamento_plataforma guarda o último estoque confirmado pela Shopee e quando isso ocorreu.
+# A reconciliação compara com produtos.estoque_real numa única query e só enfileira o que mudou.
+CONFIRM_REMOTE_STOCK_SQL = """
+    UPDATE mapeamento_plataforma
+    SET estoque_remoto_confirmado = %s, confirmado_em = NOW()
+    WHERE plataforma = %s AND produto_sku = %s AND remote_item_id = %s
+"""
+
+
+@db_metrics.instrumented
+def enqueue_stock_deltas(full=False):
+    """
+    Enfileira na sync_outbox, numa única instrução, os anúncios Shopee cujo último
+    estoque confirmado difere de produtos.estoque_real (ou nunca foi confirmado).
+    Anúncios que já têm pendência na fila são ignorados. Com full=True enfileira todos.
+    Retorna quantas pendências foram criadas, ou None em caso de erro.
+    """
+    delta_filter = "" if full else """
+        AND (m.estoque_remoto_confirmado IS NULL OR m.estoque_remoto_confirmado <> p.estoque_real)
+    """
+    sql = f"""
+        INSERT INTO sync_outbox (plataforma, produto_sku, remote_item_id, quantidade)
+        SELECT m.plataforma, m.produto_sku, m.remote_item_id, p.estoque_real
+        FROM mapeamento_plataforma m
+        JOIN produtos p ON p.sku = m.produto_sku
+        WHERE m.plataforma = 'SHOPEE' AND m.remote_item_id IS NOT NULL
+        {delta_filter}
+          AND NOT EXISTS (
+              SELECT 1 FROM sync_outbox o
+              WHERE o.remote_item_id = m.remote_item_id AND o.remote_model_id = 0
+                AND o.status IN ('PENDENTE', 'PROCESSANDO')
+          )
+    """
+
+    conn = get_db_connection()
+    if not conn:
+        return None
+
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql)
+        conn.commit()
+        db_metrics.add_rows(cursor.rowcount)
+        return cursor.rowcount
+
+    except Error as e:
+        conn.rollback()
+        _log_error(f"Erro ao calcular diferenças de estoque: {e}")
+        return None
+
+    finally:
+        if cursor is not None:
+            cursor.close()
+        conn.close()
+
+
+# --- SINCRONIZAÇÃO DE ENTRADA (PULL) ---
+# Vendas feitas na Shopee baixam produtos.estoque_real. Cada pedido é aplicado uma única vez
+# (pedidos_marketplace) e a marca d'água da consulta avança na mesma transação.
+ORDER_CANCELLED_STATUS = {"CANCELLED"}
+
+
+@db_metrics.instrumented
+def get_sync_watermark(name):
+    """Valor salvo da marca d'água 'name' (timestamp Unix), ou None se nunca rodou / erro."""
+    conn = get_db_connection()
+    if not conn:
+        return None
+
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT valor FROM sync_watermark WHERE nome = %s", (name,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    except Error as e:
+        _log_error(f"Erro ao ler marca d'água '{name}': {e}")
+        return None
+
+    finally:
+        if cursor is not None:
+            cursor.close()
+        conn.close()
+
+
+@db_metrics.instrumented
+def get_shopee_listings():
+    """Anúncios vinculados: [{'sku', 'remote_item_id', 'estoque_real', 'estoque_remoto_confirmado', 'pendente'}]."""
+    conn = get_db_connection()
+    resultados = []
+
+    if conn:
+        cursor = None
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT m.produto_sku AS sku, m.remote_item_id, p.estoque_real,
+                       m.estoque_remoto_confirmado,
+                       EXISTS (SELECT 1 FROM sync_outbox o
+                               WHERE o.remote_item_id = m.remote_item_id
+                                 AND o.status IN ('PENDENTE', 'PROCESSANDO')) AS pendente
+                FROM mapeamento_plataforma m
+                JOIN produtos p ON p.sku = m.produto_sku
+                WHERE m.plataforma = 'SHOPEE' AND m.remote_item_id IS NOT NULL
+            """)
+            resultados = cursor.fetchall()
+
+        except Error as e:
+            _log_error(f"Erro ao ler anúncios vinculados: {e}")
+
+        finally:
+            if cursor is not None:
+                cursor.close()
+            conn.close()
+
+    return resultados
+
+
+@db_metrics.instrumented
+def apply_marketplace_orders(orders, watermark_name=None, watermark_value=None, plataforma='SHOPEE'):
+    """
+    Aplica ao estoque local, numa única transação, os pedidos vindos do marketplace.
+    'orders' é uma lista de {'pedido_id', 'status', 'itens': [(remote_item_id, quantidade), ...]}.
+
+    - Pedido novo e não cancelado: baixa o estoque dos produtos vinculados (situação BAIXADO).
+    - Pedido já baixado que agora está cancelado: devolve o estoque (situação ESTORNADO).
+    - Pedido novo já cancelado ou já visto na mesma situação: nada muda.
+    O estoque remoto confirmado acompanha a mesma diferença (a Shopee já descontou a venda),
+    então a sincronização por delta não reenvia esses valores. Pendências da outbox desses
+    itens passam a levar o estoque novo (e itens com envio em andamento ganham outro),
+    para que um valor de antes da venda não chegue à Shopee.
+    Com 'watermark_name', grava 'watermark_value' junto, só se tudo der certo.
+    Retorna {'baixados', 'estornados', 'ignorados', 'skus'} ou None em caso de erro.
+    """
+    resultado = {"baixados": 0, "estornados": 0, "ignorados": 0, "skus": {}}
+    conn = get_db_connection()
+    if not conn:
+        return None
+
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        situacoes = {}
+        order_ids = [str(order['pedido_id']) for order in orders]
+        for start in range(0, len(order_ids), BULK_CHUNK_SIZE):
+            chunk = order_ids[start:start + BULK_CHUNK_SIZE]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(
+                f"SELECT pedido_id, situacao FROM pedidos_marketplace "
+                f"WHERE plataforma = %s AND pedido_id IN ({placeholders})",
+                [plataforma] + chunk
+            )
+            situacoes.update(cursor.fetchall())
+
+        item_deltas, order_rows = {}, []
+        for order in orders:
+            pedido_id = str(order['pedido_id'])
+            cancelled = order['status'] in ORDER_CANCELLED_STATUS
+            anterior = situacoes.get(pedido_id)
+            if anterior is None and not cancelled:
+                sign, situacao = -1, 'BAIXADO'
+                resultado["baixados"] += 1
+            elif anterior == 'BAIXADO' and cancelled:
+                sign, situacao = 1, 'ESTORNADO'
+                resultado["estornados"] += 1
+            else:
+                sign, situacao = 0, anterior or 'ESTORNADO'
+                resultado["ignorados"] += 1
+
+            order_rows.append((plataforma, pedido_id, order['status'], situacao))
+            if sign:
+                for item_id, qty in order['itens']:
+                    item_deltas[int(item_id)] = item_deltas.get(int(item_id), 0) + sign * int(qty)
+
+        if item_deltas:
+            cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_pedidos_delta")
+            cursor.execute("""
+                CREATE TEMPORARY TABLE tmp_pedidos_delta (
+                    remote_item_id BIGINT PRIMARY KEY,
+                    delta INT NOT NULL
+                )
+            """)
+            cursor.executemany("INSERT INTO tmp_pedidos_delta (remote_item_id, delta) VALUES (%s, %s)",
+                               list(item_deltas.items()))
+            cursor.execute("""
+                UPDATE produtos p
+                JOIN mapeamento_plataforma m ON m.produto_sku = p.sku AND m.plataforma = %s
+                JOIN tmp_pedidos_delta d ON d.remote_item_id = m.remote_item_id
+                SET p.estoque_real = GREATEST(0, CAST(p.estoque_real AS SIGNED) + d.delta),
+                    m.estoque_remoto_confirmado = CASE
+                        WHEN m.estoque_remoto_confirmado IS NULL THEN NULL
+                        ELSE GREATEST(0, CAST(m.estoque_remoto_confirmado AS SIGNED) + d.delta) END
+            """, (plataforma,))
+            db_metrics.add_rows(cursor.rowcount)
+            # Envios ainda na fila levam o estoque de antes da venda: passam a levar o novo.
+            # Itens com envio em andamento (valor antigo a caminho) ganham um envio novo.
+            cursor.execute("""
+                UPDATE sync_outbox o
+                JOIN tmp_pedidos_delta d ON d.remote_item_id = o.remote_item_id
+                JOIN mapeamento_plataforma m ON m.remote_item_id = o.remote_item_id AND m.plataforma = o.plataforma
+                JOIN produtos p ON p.sku = m.produto_sku
+                SET o.quantidade = p.estoque_real
+                WHERE o.plataforma = %s AND o.status = 'PENDENTE' AND o.remote_model_id = 0
+            """, (plataforma,))
+            cursor.execute("""
+                INSERT INTO sync_outbox (plataforma, produto_sku, remote_item_id, quantidade)
+                SELECT m.plataforma, m.produto_sku, m.remote_item_id, p.estoque_real
+                FROM tmp_pedidos_delta d
+                JOIN mapeamento_plataforma m ON m.remote_item_id = d.remote_item_id AND m.plataforma = %s
+                JOIN produtos p ON p.sku = m.produto_sku
+                WHERE EXISTS (SELECT 1 FROM sync_outbox o
+                              WHERE o.remote_item_id = d.remote_item_id AND o.status = 'PROCESSANDO')
+                  AND NOT EXISTS (SELECT 1 FROM sync_outbox o
+                                  WHERE o.remote_item_id = d.remote_item_id AND o.status = 'PENDENTE')
+            """, (plataforma,))
+            cursor.execute("""
+                SELECT p.sku, p.estoque_real
+                FROM tmp_pedidos_delta d
+                JOIN mapeamento_plataforma m ON m.remote_item_id = d.remote_item_id AND m.plataforma = %s
+                JOIN produtos p ON p.sku = m.produto_sku
+            """, (plataforma,))
+            resultado["skus"] = dict(cursor.fetchall())
+            cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_pedidos_delta")
+
+        if order_rows:
+            cursor.executemany("""
+                INSERT INTO pedidos_marketplace (plataforma, pedido_id, status, situacao)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE status = VALUES(status), situacao = VALUES(situacao)
+            """, order_rows)
+
+        if watermark_name is not None:
+            cursor.execute("""
+                INSERT INTO sync_watermark (nome, valor) VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE valor = VALUES(valor)
+            """, (watermark_name, int(watermark_value)))
+
+        conn.commit()
+
+    except Error as e:
+        conn.rollback()
+        _log_error(f"Erro ao aplicar pedidos do marketplace: {e}")
+        return None
+
+    finally:
+        if cursor is not None:
+            cursor.close()
+        conn.close()
+
+    for sku, estoque in resultado["skus"].items():
+        _catalog.set_stock(sku, estoque)
+    if resultado["skus"]:
+        invalidate_search_cache()
+    return resultado
+
+
+@db_metrics.instrumented
+def adopt_remote_stock(changes, plataforma='SHOPEE'):
+    """
+    Traz para o estoque local alterações feitas direto no marketplace.
+    'changes' é uma lista de (sku, remote_item_id, estoque remoto, estoque confirmado):
+    o local muda pela mesma diferença (remoto - confirmado) e o confirmado passa a ser o remoto.
+    """
+    if not changes:
+        return True
+    ok = _execute_write([
+        ("UPDATE produtos SET estoque_real = GREATEST(0, CAST(estoque_real AS SIGNED) + %s) WHERE sku = %s",
+         [(remote - confirmed, sku) for sku, _, remote, confirmed in changes]),
+        (CONFIRM_REMOTE_STOCK_SQL, [(remote, plataforma, sku, item_id)
+                                    for sku, item_id, remote, _ in changes]),
+    ], "aplicar estoque remoto")
+    if ok:
+        _catalog.expire()
+        invalidate_search_cache()
+    return ok
@@ -0,0 +1,265 @@
+"""
+Métricas das chamadas ao banco (database.py).
+
+Cada função decorada com @instrumented registra: número de chamadas, erros,
+histograma de latência, linhas devolvidas/afetadas e o tempo esperando conexão
+do pool. Chamadas acima de config.DB_SLOW_QUERY_MS entram no log de lentas e
+são repassadas aos ouvintes (ex.: painel de log da GUI).
+Leitura: snapshot() (dict) ou prometheus_text() / write_prometheus(path).
+"""
+import functools
+import threading
+import time
+from collections import deque
+
+import config
+from file_utils import atomic_write
+
+# Limites (em segundos) dos baldes do histograma de latência
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_LOG_SIZE = 100
+
+
+class FunctionStats:
+    __slots__ = ("calls", "errors", "total", "max", "buckets", "rows", "wait")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # último = acima do maior limite
+        self.rows = 0
+        self.wait = 0.0
+
+    def percentile(self, fraction):
+        """Estimativa pelo histograma: limite do balde onde cai o percentil."""
+        if not self.calls:
+            return 0.0
+        target = fraction * self.calls
+        seen = 0
+        for limit, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if seen >= target:
+                return limit
+        return self.max
+
+
+class _CallContext:
+    __slots__ = ("rows", "wait", "failed")
+
+    def __init__(self):
+        self.rows = None
+        self.wait = 0.0
+        self.failed = False
+
+
+_stats = {}
+_lock = threading.Lock()
+_local = threading.local()
+_slow_log = deque(maxlen=SLOW_LOG_SIZE)
+_slow_listeners = []
+_pool_stats = None  # Função que devolve as métricas do pool (registrada pelo database.py)
+
+
+def _current():
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else None
+
+
+def add_rows(count):
+    """Informa as linhas afetadas pela chamada em andamento (quando o retorno não diz)."""
+    context = _current()
+    if context is not None and count is not None and count >= 0:
+        context.rows = (context.rows or 0) + count
+
+
+def connection_wait(seconds):
+    """Tempo esperando conexão do pool, somado à chamada em andamento."""
+    context = _current()
+    if context is not None:
+        context.wait += seconds
+
+
+def failed():
+    """Marca a chamada em andamento como erro (as funções do database.py tratam as exceções)."""
+    context = _current()
+    if context is not None:
+        context.failed = True
+
+
+def set_pool_stats_source(func):
+    global _pool_stats
+    _pool_stats = func
+
+
+def add_slow_listener(callback):
+    """'callback(nome, segundos, linhas)' é chamado (na thread da consulta) a cada chamada lenta."""
+    _slow_listeners.append(callback)
+
+
+def remove_slow_listener(callback):
+    if callback in _slow_listeners:
+        _slow_listeners.remove(callback)
+
+
+def _count_rows(result):
+    if isinstance(result, bool) or result is None:
+        return None
+    if isinstance(result, int):
+        return result
+    if isinstance(result, dict):
+        return sum(len(value) for value in result.values() if isinstance(value, (list, set)))
+    try:
+        return len(result)
+    except TypeError:
+        return None
+
+
+def record(name, elapsed, rows=None, wait=0.0, error=False):
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = FunctionStats()
+        stats.calls += 1
+        stats.total += elapsed
+        stats.max = max(stats.max, elapsed)
+        stats.wait += wait
+        if error:
+            stats.errors += 1
+        if rows:
+            stats.rows += rows
+        position = 0
+        while position < len(LATENCY_BUCKETS) and elapsed > LATENCY_BUCKETS[position]:
+            position += 1
+        stats.buckets[position] += 1
+
+    if elapsed * 1000 >= config.DB_SLOW_QUERY_MS:
+        _slow_log.append((time.time(), name, elapsed, rows))
+        for callback in list(_slow_listeners):
+            try:
+                callback(name, elapsed, rows)
+            except Exception:
+                pass
+
+
+def instrumented(func):
+    """Decorador das funções públicas do database.py."""
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        context = _CallContext()
+        stack.append(context)
+        started = time.perf_counter()
+        error = False
+        result = None
+        try:
+            result = func(*args, **kwargs)
+            return result
+        except Exception:
+            error = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            stack.pop()
+            rows = context.rows if context.rows is not None else _count_rows(result)
+            record(name, elapsed, rows, context.wait, error or context.failed)
+
+    return wrapper
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+    _slow_log.clear()
+
+
+def slow_queries():
+    """Últimas chamadas lentas: [(timestamp, nome, segundos, linhas)]."""
+    return list(_slow_log)
+
+
+def snapshot():
+    """Retrato das métricas: por função (chamadas, erros, latências em ms, linhas) e do pool."""
+    with _lock:
+        functions = {
+            name: {
+                "calls": stats.calls,
+                "errors": stats.errors,
+                "rows": stats.rows,
+                "avg_ms": stats.total / stats.calls * 1000 if stats.calls else 0.0,
+                "p95_ms": stats.percentile(0.95) * 1000,
+                "max_ms": stats.max * 1000,
+                "wait_ms": stats.wait * 1000,
+            }
+            for name, stats in _stats.items()
+        }
+    return {
+        "functions": functions,
+        "slow_queries": len(_slow_log),
+        "pool": _pool_stats() if _pool_stats else None,
+    }
+
+
+def prometheus_text():
+    """Métricas no formato texto do Prometheus (para o textfile collector do node_exporter)."""
+    lines = [
+        "# HELP erp_db_call_seconds Latência das funções do database.py",
+        "# TYPE erp_db_call_seconds histogram",
+    ]
+    with _lock:
+        items = sorted((name, stats.calls, stats.total, list(stats.buckets), stats.errors,
+                        stats.rows, stats.wait) for name, stats in _stats.items())
+
+    for name, calls, total, buckets, _, _, _ in items:
+        cumulative = 0
+        for limit, count in zip(LATENCY_BUCKETS, buckets):
+            cumulative += count
+            lines.append(f'erp_db_call_seconds_bucket{{func="{name}",le="{limit}"}} {cumulative}')
+        lines.append(f'erp_db_call_seconds_bucket{{func="{name}",le="+Inf"}} {calls}')
+        lines.append(f'erp_db_call_seconds_sum{{func="{name}"}} {total:.6f}')
+        lines.append(f'erp_db_call_seconds_count{{func="{name}"}} {calls}')
+
+    for metric, help_text, position in (
+            ("erp_db_call_errors_total", "Chamadas que terminaram em erro", 4),
+            ("erp_db_rows_total", "Linhas devolvidas ou afetadas", 5),
+            ("erp_db_connection_wait_seconds_total", "Tempo esperando conexão do pool", 6)):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for item in items:
+            lines.append(f'{metric}{{func="{item[0]}"}} {item[position]}')
+
+    pool = _pool_stats() if _pool_stats else None
+    if pool:
+        lines.append("# TYPE erp_db_pool_connections gauge")
+        for state in ("in_use", "idle", "created", "size"):
+            lines.append(f'erp_db_pool_connections{{state="{state}"}} {pool[state]}')
+        lines.append("# TYPE erp_db_pool_timeouts_total counter")
+        lines.append(f"erp_db_pool_timeouts_total {pool['timeouts']}")
+
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    """Grava prometheus_text() de forma atômica (o coletor nunca lê arquivo pela metade)."""
+    text = prometheus_text()
+    atomic_write(path, lambda handle: handle.write(text))
+
+
+def start_prometheus_writer(path, interval=15.0):
+    """Thread que regrava o arquivo de métricas a cada 'interval' segundos. Retorna o Event de parada."""
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                write_prometheus(path)
+            except OSError as exc:
+                print(f"Erro ao gravar métricas em {path}: {exc}")
+
+    threading.Thread(target=run, name="db-metrics-writer", daemon=True).start()
+    return stop
@@ -0,0 +1,196 @@
+import threading
+import time
+
+import mysql.connector
+from mysql.connector import Error
+
+
+class PoolTimeoutError(Error):
+    """Nenhuma conexão ficou livre dentro do tempo de espera configurado."""
+
+
+class PooledConnection:
+    """
+    Proxy de uma conexão emprestada do pool.
+    Repassa tudo para a conexão real, mas close() devolve a conexão ao pool
+    ao invés de encerrar o socket.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool._release(raw)
+
+    def is_connected(self):
+        return self._raw is not None and self._raw.is_connected()
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise Error("Conexão já devolvida ao pool.")
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Pool de conexões MySQL com tamanho fixo.
+    - Cria conexões sob demanda até 'size'.
+    - Faz health check (ping com reconexão) ao emprestar conexões paradas há mais
+      de 'ping_interval' segundos, o que cobre reinícios do servidor.
+    - Mede quantas conexões estão em uso e quanto tempo os chamadores esperam.
+    """
+
+    def __init__(self, size=5, timeout=10.0, ping_interval=10.0, **connect_kwargs):
+        self.size = max(1, int(size))
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self._connect_kwargs = connect_kwargs
+
+        self._idle = []  # Pilha (LIFO): reaproveita a conexão mais "quente"
+        self._lock = threading.Lock()
+        # Avisado quando volta uma conexão ou abre uma vaga (conexão descartada)
+        self._available = threading.Condition(self._lock)
+        self._created = 0
+        self._in_use = 0
+
+        # Métricas
+        self._acquires = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._reconnects = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    # ------------------------------------------------------------------ #
+    def _connect(self):
+        return mysql.connector.connect(**self._connect_kwargs)
+
+    def _discard_slot(self):
+        """Libera a vaga de uma conexão descartada e acorda quem espera para abrir outra."""
+        with self._available:
+            self._created -= 1
+            self._available.notify()
+
+    def _checkout(self, raw, idle_since):
+        """Health check da conexão antes de entregá-la ao chamador."""
+        if time.monotonic() - idle_since < self.ping_interval:
+            return raw
+        try:
+            raw.ping(reconnect=True, attempts=2, delay=0.5)
+            return raw
+        except Error:
+            # Conexão morta (ex.: servidor reiniciado) e reconexão falhou: descarta e abre outra
+            with self._lock:
+                self._reconnects += 1
+            try:
+                raw.close()
+            except Error:
+                pass
+            return self._connect()
+
+    def acquire(self, timeout=None):
+        """Empresta uma conexão. Levanta PoolTimeoutError se o pool estiver esgotado."""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+        raw = None
+
+        with self._available:
+            # A cada aviso confere de novo: pode ter voltado uma conexão ou aberto uma vaga
+            while True:
+                if self._idle:
+                    raw, idle_since = self._idle.pop()
+                    break
+                if self._created < self.size:
+                    self._created += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(
+                        msg=f"Pool esgotado: nenhuma conexão livre em {timeout}s "
+                            f"({self.size} em uso)."
+                    )
+                waited = True
+                self._available.wait(remaining)
+
+        try:
+            if raw is None:
+                raw = self._connect()
+            else:
+                raw = self._checkout(raw, idle_since)
+        except Error:
+            self._discard_slot()
+            raise
+
+        wait = time.monotonic() - started
+        with self._lock:
+            self._acquires += 1
+            self._in_use += 1
+            if waited:
+                self._waits += 1
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+
+        return PooledConnection(self, raw)
+
+    def _release(self, raw):
+        with self._lock:
+            self._in_use -= 1
+
+        try:
+            if raw.is_connected():
+                # Não deixa transação aberta vazar para o próximo chamador
+                if raw.in_transaction:
+                    raw.rollback()
+                with self._available:
+                    self._idle.append((raw, time.monotonic()))
+                    self._available.notify()
+                return
+        except Error:
+            pass
+
+        # Conexão quebrada: libera a vaga para uma nova ser criada
+        self._discard_slot()
+        try:
+            raw.close()
+        except Error:
+            pass
+
+    def close_all(self):
+        """Encerra as conexões ociosas (as emprestadas fecham ao serem devolvidas)."""
+        with self._available:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._available.notify_all()
+        for raw, _ in idle:
+            try:
+                raw.close()
+            except Error:
+                pass
+
+    def stats(self):
+        """Retorna um retrato das métricas do pool."""
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "acquires": self._acquires,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "reconnects": self._reconnects,
+                "avg_wait_ms": (self._total_wait / self._acquires * 1000) if self._acquires else 0.0,
+                "max_wait_ms": self._max_wait * 1000,
+            }
@@ -1,90 +1,26 @@
-import json
-from pathlib import Path
-
 import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
+from tkinter import ttk, messagebox, scrolledtext, filedialog
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # Importa os nossos módulos criados nos passos anteriores
 import config
 import database
+import db_metrics
+import passwords
+from outbox import OutboxDispatcher
+from product_columns import ProductColumns, ProductTableRows
 from shopee_client import ShopeeClient
+from shopee_sync import ShopeeSyncEngine
+from stock_import import import_stock_file
+from user_store import UserStore
+from virtual_tree import VirtualTree
 
 LOGIN_WIDTH = 560
 LOGIN_HEIGHT = 460
 TREE_COLUMNS = ("sku", "nome", "estoque", "shopee_id", "status")
-
-
-class UserStore:
-    """Armazena usuários com acesso limitado em um arquivo JSON local."""
-
-    def __init__(self, file_path="users.json", default_username=None, default_password=None):
-        self.path = Path(file_path)
-        self.path.parent.mkdir(parents=True, exist_ok=True)
-        self.default_username = default_username
-        self.default_password = default_password
-        self._ensure_storage()
-
-    def _ensure_storage(self):
-        if self.path.exists():
-            return
-
-        initial_users = []
-        if self.default_username and self.default_password:
-            initial_users.append({
-                "username": self.default_username,
-                "password": self.default_password,
-                "role": "limited"
-            })
-
-        self._save_users(initial_users)
-
-    def _load_users(self):
-        if not self.path.exists():
-            return []
-
-        try:
-            raw = self.path.read_text(encoding="utf-8")
-            return json.loads(raw) if raw else []
-        except json.JSONDecodeError:
-            return []
-
-    def _save_users(self, users):
-        self.path.write_text(json.dumps(users, indent=2), encoding="utf-8")
-
-    def list_users(self):
-        return self._load_users()
-
-    def validate_user(self, username, password):
-        username = username.strip().lower()
-        for user in self._load_users():
-            if user["username"].lower() == username and user["password"] == password:
-                return True
-        return False
-
-    def add_user(self, username, password):
-        username = username.strip()
-        if not username or not password:
-            return False, "Usuário e senha são obrigatórios."
-
-        users = self._load_users()
-        if any(u["username"].lower() == username.lower() for u in users):
-            return False, "Usuário já existe."
-
-        users.append({"username": username, "password": password, "role": "limited"})
-        self._save_users(users)
-        return True, "Usuário criado com sucesso."
-
-    def remove_user(self, username):
-        users = self._load_users()
-        filtered = [u for u in users if u["username"].lower() != username.lower()]
-
-        if len(filtered) == len(users):
-            return False, "Usuário não encontrado."
-
-        self._save_users(filtered)
-        return True, "Usuário removido."
+SEARCH_DEBOUNCE_MS = 300  # Espera após a última tecla antes de buscar
 
 
 class LoginWindow(tk.Tk):
@@ -126,8 +62,13 @@ class LoginWindow(tk.Tk):
         self.ent_pass.pack(fill=tk.X, pady=(0, 15))
         self.ent_pass.bind("<Return>", lambda _: self._attempt_login())
 
-        ttk.Button(container, text="Entrar", command=self._attempt_login).pack(fill=tk.X)
+        self.btn_login = ttk.Button(container, text="Entrar", command=self._attempt_login)
+        self.btn_login.pack(fill=tk.X)
+        self.status_var = tk.StringVar()
+        tk.Label(container, textvariable=self.status_var, bg="#1e293b", fg="#94a3b8",
+                 font=("Segoe UI", 9)).pack(pady=(10, 0))
         self.ent_user.focus_set()
+        self._verifying = False
 
     def _center(self):
         self.update_idletasks()
@@ -138,24 +79,46 @@ class LoginWindow(tk.Tk):
         self.geometry(f"{width}x{height}+{x}+{y}")
 
     def _attempt_login(self):
+        if self._verifying:
+            return
         username = self.ent_user.get().strip()
         password = self.ent_pass.get().strip()
 
-        if username == config.SUPERUSER_USERNAME and password == config.SUPERUSER_PASSWORD:
-            self.success = True
-            self.username = username
-            self.user_role = "superuser"
-            self.destroy()
-            return
+        # O hash da senha leva centenas de ms de propósito: roda numa thread para a
+        # janela continuar respondendo
+        self._verifying = True
+        self.btn_login.state(["disabled"])
+        self.status_var.set("Verificando...")
+        threading.Thread(target=self._verify_credentials, args=(username, password),
+                         name="login-verify", daemon=True).start()
 
-        if self.user_store.validate_user(username, password):
-            self.success = True
-            self.username = username
-            self.user_role = "limited"
-            self.destroy()
+    def _verify_credentials(self, username, password):
+        role = None
+        try:
+            if (config.SUPERUSER_USERNAME and username == config.SUPERUSER_USERNAME
+                    and passwords.verify_password(password, config.SUPERUSER_PASSWORD)):
+                role = "superuser"
+            elif self.user_store.validate_user(username, password):
+                role = "limited"
+        except Exception as exc:
+            print(f"Erro ao verificar login: {exc}")
+        try:
+            self.after(0, self._finish_login, username, role)
+        except (RuntimeError, tk.TclError):
+            pass  # Janela já foi fechada
+
+    def _finish_login(self, username, role):
+        self._verifying = False
+        self.status_var.set("")
+        self.btn_login.state(["!disabled"])
+        if role is None:
+            messagebox.showerror("Acesso negado", "Usuário ou senha incorretos.")
             return
 
-        messagebox.showerror("Acesso negado", "Usuário ou senha incorretos.")
+        self.success = True
+        self.username = username
+        self.user_role = role
+        self.destroy()
 
     def _handle_close(self):
         self.success = False
@@ -168,8 +131,18 @@ class ERPApp(tk.Tk):
         self.current_user = username
         self.user_role = role
         self.user_store = user_store
-        self.selected_item_iid = None
+        self.selected_index = None
         self.search_term = tk.StringVar()
+        self._page_term = None
+        self._last_loaded_id = 0
+        self._search_after_id = None
+        self._last_search = None
+
+        # Consultas ao banco rodam fora da thread do Tk; cada nova carga invalida a anterior
+        self.db_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="erp-db")
+        self._load_generation = 0
+        self._load_future = None
+        self._loading_count = 0
 
         self.selected_sku = tk.StringVar(value="---")
         self.selected_name = tk.StringVar(value="---")
@@ -180,9 +153,20 @@ class ERPApp(tk.Tk):
         self.title("Sistema ERP Integrado - Shopee & Estoque Local")
         self.geometry("1100x720")
         self.configure(bg="#f0f2f5")
+        self.protocol("WM_DELETE_WINDOW", self._handle_close)
 
-        # 2. Inicializa o Cliente Shopee
+        # 2. Inicializa o Cliente Shopee e o despachante da fila de sincronização
         self.shopee = ShopeeClient()
+        self.outbox = OutboxDispatcher(ShopeeSyncEngine(self.shopee),
+                                       on_result=self._on_outbox_result)
+        self.outbox.start()
+
+        # Consultas lentas aparecem no painel de log; métricas opcionais em arquivo Prometheus
+        db_metrics.add_slow_listener(self._on_slow_query)
+        self._metrics_stop = None
+        if config.DB_METRICS_FILE:
+            self._metrics_stop = db_metrics.start_prometheus_writer(config.DB_METRICS_FILE,
+                                                                    config.DB_METRICS_INTERVAL)
 
         # 3. Constroi a Interface
         self.setup_styles()
@@ -190,6 +174,7 @@ class ERPApp(tk.Tk):
 
         # 4. Carrega os dados iniciais assim que abre
         self.after(100, self.refresh_data)
+        self.after(500, self.check_query_plans)
 
     def setup_styles(self):
         """Define cores e fontes para ficar com cara de software profissional."""
@@ -278,6 +263,8 @@ class ERPApp(tk.Tk):
         search_entry = ttk.Entry(control_frame, textvariable=self.search_term, width=35)
         search_entry.pack(side=tk.LEFT, padx=10)
         search_entry.bind("<Return>", lambda _: self.search_products())
+        # Busca enquanto digita: cada tecla reagenda a busca (debounce)
+        self.search_term.trace_add("write", self._on_search_typed)
 
         ttk.Button(control_frame, text="Buscar", command=self.search_products).pack(side=tk.LEFT)
         ttk.Button(control_frame, text="Limpar", command=self.clear_search).pack(side=tk.LEFT, padx=(10, 0))
@@ -286,10 +273,17 @@ class ERPApp(tk.Tk):
         tk.Label(control_frame, textvariable=self.result_var, bg="#f0f2f5", fg="#475569",
                  font=("Segoe UI", 10)).pack(side=tk.RIGHT)
 
+        # Indicador de carregamento: só aparece enquanto há consulta em andamento
+        self.loading_bar = ttk.Progressbar(control_frame, mode="indeterminate", length=120)
+
         tree_frame = tk.Frame(self.search_tab)
         tree_frame.pack(fill=tk.BOTH, expand=True)
 
-        self.tree = ttk.Treeview(tree_frame, columns=TREE_COLUMNS, show="headings", height=12)
+        # Só as linhas visíveis vão para o Treeview; o resto fica na memória da VirtualTree
+        self.table = VirtualTree(tree_frame, TREE_COLUMNS,
+                                 on_select=self.on_tree_select,
+                                 on_need_more=self.load_next_page)
+        self.tree = self.table.tree
         self.tree.heading("sku", text="SKU (Código)")
         self.tree.heading("nome", text="Produto")
         self.tree.heading("estoque", text="Qtd. Local")
@@ -302,12 +296,8 @@ class ERPApp(tk.Tk):
         self.tree.column("shopee_id", width=140, anchor="center")
         self.tree.column("status", width=150, anchor="center")
 
-        scroller = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scroller.set)
-        self.tree.bind("<<TreeviewSelect>>", self.on_tree_select)
-
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scroller.pack(side=tk.RIGHT, fill=tk.Y)
+        self.table.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
     def build_update_tab(self):
         info_box = tk.LabelFrame(self.update_tab, text="Produto Selecionado", bg="#f0f2f5",
@@ -331,6 +321,19 @@ class ERPApp(tk.Tk):
                                      command=self.start_update_thread)
         self.btn_update.pack(anchor="w")
 
+        import_frame = tk.LabelFrame(self.update_tab, text="Importação em Lote", bg="#f0f2f5",
+                                     font=("Segoe UI", 10, "bold"))
+        import_frame.pack(fill=tk.X, pady=(15, 0))
+
+        tk.Label(import_frame, text="Arquivo CSV (sku;quantidade) ou XLSX do fornecedor",
+                 bg="#f0f2f5", font=("Segoe UI", 10)).pack(anchor="w", pady=(5, 5))
+        self.import_dry_run = tk.BooleanVar(value=False)
+        ttk.Checkbutton(import_frame, text="Apenas validar (não grava)",
+                        variable=self.import_dry_run).pack(anchor="w")
+        self.btn_import = ttk.Button(import_frame, text="Importar arquivo...",
+                                     command=self.start_import)
+        self.btn_import.pack(anchor="w", pady=(5, 10))
+
     def _add_info_row(self, parent, label_text, var):
         row = tk.Frame(parent, bg="#f0f2f5")
         row.pack(fill=tk.X, pady=2)
@@ -387,71 +390,191 @@ class ERPApp(tk.Tk):
         self.log_widget.see(tk.END)
         self.log_widget.config(state='disabled')
 
-    def populate_tree(self, produtos):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-
-        for p in produtos:
-            shopee_id = p['shopee_id'] if p['shopee_id'] else "---"
-            self.tree.insert("", "end", values=(
-                p['sku'],
-                p['nome'],
-                p['estoque_real'],
-                shopee_id,
-                "Aguardando"
-            ))
-
-        self.result_var.set(f"{len(produtos)} produtos")
+    def populate_tree(self, produtos, total=None):
+        # Colunas compactas em vez de uma tupla por produto; as tuplas exibidas são montadas
+        # só para as linhas visíveis
+        if not isinstance(produtos, ProductColumns):
+            produtos = ProductColumns.from_rows(produtos)
+        rows = ProductTableRows(produtos)
+        self.table.set_rows(rows, total)
+        self.result_var.set(f"{max(total or 0, len(rows))} produtos")
         self.clear_selection()
 
+    # ---------------------------- CARGA ASSÍNCRONA ---------------------------- #
+    def run_in_background(self, func, on_success, on_error=None):
+        """Roda 'func' no executor de banco e entrega o resultado na thread do Tk."""
+        future = self.db_executor.submit(func)
+
+        def done(f):
+            try:
+                self.after(0, self._deliver_result, f, on_success, on_error)
+            except (RuntimeError, tk.TclError):
+                pass  # Janela já foi fechada
+
+        future.add_done_callback(done)
+        return future
+
+    def _deliver_result(self, future, on_success, on_error):
+        if future.cancelled():
+            return
+        exc = future.exception()
+        if exc is not None:
+            self.log(f"❌ Erro ao consultar o banco: {exc}")
+            if on_error:
+                on_error(exc)
+            return
+        on_success(future.result())
+
+    def _set_loading(self, active):
+        self._loading_count = max(0, self._loading_count + (1 if active else -1))
+        if self._loading_count and not self.loading_bar.winfo_ismapped():
+            self.loading_bar.pack(side=tk.RIGHT, padx=10)
+            self.loading_bar.start(12)
+            self.result_var.set("Carregando...")
+        elif not self._loading_count and self.loading_bar.winfo_ismapped():
+            self.loading_bar.stop()
+            self.loading_bar.pack_forget()
+
+    def load_products(self, term=None):
+        """
+        Carrega a listagem numa thread do executor: sem termo, conta o catálogo e traz só
+        a primeira página (as demais vêm com a rolagem); com termo, usa a busca ranqueada.
+        Uma carga nova substitui a anterior.
+        """
+        self._load_generation += 1
+        generation = self._load_generation
+        if self._load_future is not None and self._load_future.cancel():
+            # Ainda nem tinha começado: não vai rodar nem entregar resultado
+            self._set_loading(False)
+
+        def query():
+            if term:
+                # Busca ranqueada no índice: o resultado inteiro vai para a tabela virtual
+                rows = database.search_products(term, columnar=True)
+                return len(rows), rows
+            total = database.count_products()
+            page = database.get_products_page(0, database.PAGE_SIZE)
+            return total, page
+
+        self._set_loading(True)
+        self._load_future = self.run_in_background(
+            query,
+            lambda result: self._on_products_loaded(generation, term, result),
+            lambda _exc: self._set_loading(False)
+        )
+
+    def _on_products_loaded(self, generation, term, result):
+        self._set_loading(False)
+        if generation != self._load_generation:
+            return  # Resultado de uma busca que já foi substituída
+
+        total, page = result
+        self._page_term = term
+        self._last_loaded_id = page[-1]['id'] if len(page) else 0
+        self.populate_tree(page, total)
+
+        if term:
+            self.log(f"{total} produtos encontrados para '{term}'.")
+        else:
+            self.log(f"Tabela atualizada. {total} produtos no catálogo.")
+
+    def load_next_page(self):
+        generation = self._load_generation
+        after_id, term = self._last_loaded_id, self._page_term
+
+        def on_page(page):
+            if generation != self._load_generation:
+                return
+            if page:
+                self._last_loaded_id = page[-1]['id']
+            self.table.append_rows(page)
+
+        def on_error(_exc):
+            if generation == self._load_generation:
+                self.table.append_rows([])  # Encerra a paginação desta carga
+
+        self.run_in_background(
+            lambda: database.get_products_page(after_id, database.PAGE_SIZE, term),
+            on_page,
+            on_error
+        )
+
+    def check_query_plans(self):
+        """Avisa no log se alguma consulta principal está varrendo tabelas inteiras."""
+        def report(warnings):
+            for warning in warnings or []:
+                self.log(f"⚠️ Banco: {warning} (rode 'python cli.py migrate')")
+
+        self.run_in_background(database.check_query_plans, report)
+
     def refresh_data(self):
+        self._last_search = ""  # A tabela passa a mostrar o catálogo completo
         self.log("Buscando dados atualizados do banco...")
-        produtos = database.get_all_products()
-        self.populate_tree(produtos)
-        self.log(f"Tabela atualizada. {len(produtos)} produtos carregados.")
+        self.load_products()
+
+    def _cancel_pending_search(self):
+        if self._search_after_id is not None:
+            self.after_cancel(self._search_after_id)
+            self._search_after_id = None
+
+    def _on_search_typed(self, *_args):
+        self._cancel_pending_search()
+        self._search_after_id = self.after(SEARCH_DEBOUNCE_MS, self._run_typed_search)
+
+    def _run_typed_search(self):
+        self._search_after_id = None
+        if self.search_term.get().strip() != self._last_search:
+            self.search_products()
 
     def search_products(self):
+        self._cancel_pending_search()
         term = self.search_term.get().strip()
+        self._last_search = term
         if not term:
             self.refresh_data()
             return
 
         self.log(f"Buscando por '{term}'...")
-        produtos = database.search_products(term)
-        self.populate_tree(produtos)
-        self.log(f"{len(produtos)} produtos encontrados para '{term}'.")
+        self.load_products(term)
 
     def clear_search(self):
         self.search_term.set("")
-        self.refresh_data()
+        self.search_products()
 
-    def on_tree_select(self, _event=None):
-        selected = self.tree.selection()
-        if not selected:
-            self.clear_selection()
-            return
+    def on_tree_select(self, index):
+        values = self.table.get_row(index)
 
-        iid = selected[0]
-        values = self.tree.item(iid)['values']
-        if not values:
-            return
-
-        self.selected_item_iid = iid
+        self.selected_index = index
         self.selected_sku.set(values[0])
         self.selected_name.set(values[1])
         self.selected_stock.set(values[2])
         self.selected_shopee_id.set(values[3])
 
     def clear_selection(self):
-        self.selected_item_iid = None
+        self.selected_index = None
+        self.table.clear_selection()
         self.selected_sku.set("---")
         self.selected_name.set("---")
         self.selected_stock.set("---")
         self.selected_shopee_id.set("---")
         self.new_stock_entry.delete(0, tk.END)
 
+    def _find_row(self, index, sku):
+        """Localiza a linha do SKU (a posição pode ter mudado se a tabela foi recarregada)."""
+        rows = self.table.rows
+        if not len(rows):
+            return None
+        if index is not None and index < len(rows) and rows[index][0] == sku:
+            return index
+        return rows.index_of(sku)
+
+    def _update_row(self, index, sku, **values):
+        index = self._find_row(index, sku)
+        if index is not None:
+            self.table.update_row(index, **values)
+
     def start_update_thread(self):
-        if not self.selected_item_iid:
+        if self.selected_index is None:
             messagebox.showwarning("Seleção necessária", "Selecione um produto na aba de pesquisa.")
             return
 
@@ -460,48 +583,33 @@ class ERPApp(tk.Tk):
             messagebox.showerror("Erro", "Digite um número inteiro válido para o estoque.")
             return
 
+        row = self.table.get_row(self.selected_index)
         self.btn_update.config(state="disabled")
         threading.Thread(target=self.process_update,
-                         args=(self.selected_item_iid, int(qty_str)),
+                         args=(self.selected_index, row[0], str(row[3]), int(qty_str)),
                          daemon=True).start()
 
-    def process_update(self, item_iid, new_qty):
+    def process_update(self, row_index, sku, shopee_id, new_qty):
         try:
-            if not self.tree.exists(item_iid):
-                self.log("❌ Item selecionado não existe mais na lista.")
-                return
-
-            current_values = self.tree.item(item_iid)['values']
-            if not current_values:
-                self.log("❌ Não foi possível recuperar os dados do item selecionado.")
-                return
-
-            sku = current_values[0]
-            shopee_id = str(current_values[3])
-
             self.log(f"--- INICIANDO PROCESSO PARA {sku} ---")
             self.log(f"Atualizando banco local para {new_qty} un...")
 
             if database.update_stock(sku, new_qty):
-                self.after(0, lambda: self.tree.set(item_iid, "estoque", new_qty))
+                self.after(0, lambda: self._update_row(row_index, sku, estoque=new_qty))
                 self.after(0, lambda: self.selected_stock.set(str(new_qty)))
             else:
                 self.log("❌ Erro ao atualizar banco local. Abortando.")
                 return
 
             if shopee_id not in ("---", "None"):
-                self.log(f"Conectando à API Shopee (Item ID: {shopee_id})...")
-                resultado = self.shopee.update_stock(shopee_id, new_qty)
-
-                if not resultado.get("error"):
-                    self.log(f"✅ SHOPEE ATUALIZADA! Msg: {resultado['msg']}")
-                    self.after(0, lambda: self.tree.set(item_iid, "status", "Sincronizado"))
-                else:
-                    self.log(f"❌ Erro Shopee: {resultado['error']}")
-                    self.after(0, lambda: self.tree.set(item_iid, "status", "Erro API"))
+                # O envio já ficou registrado na outbox junto com o estoque local;
+                # o despachante manda para a Shopee em segundo plano
+                self.log(f"Envio para a Shopee (Item ID: {shopee_id}) colocado na fila.")
+                self.after(0, lambda: self._update_row(row_index, sku, status="Na fila"))
+                self.outbox.wake()
             else:
                 self.log("ℹ️ Produto não vinculado à Shopee. Apenas local atualizado.")
-                self.after(0, lambda: self.tree.set(item_iid, "status", "Local Only"))
+                self.after(0, lambda: self._update_row(row_index, sku, status="Local Only"))
 
         except Exception as exc:
             self.log(f"❌ ERRO CRÍTICO NA THREAD: {exc}")
@@ -511,6 +619,72 @@ class ERPApp(tk.Tk):
             self.after(0, lambda: self.new_stock_entry.delete(0, tk.END))
             self.log("--- PROCESSO FINALIZADO ---")
 
+    def start_import(self):
+        path = filedialog.askopenfilename(
+            title="Arquivo de estoque",
+            filetypes=[("Planilhas", "*.csv *.txt *.xlsx"), ("Todos os arquivos", "*.*")]
+        )
+        if not path:
+            return
+
+        dry_run = self.import_dry_run.get()
+        self.btn_import.config(state="disabled")
+        self.log(f"Importando {path}{' (apenas validação)' if dry_run else ''}...")
+
+        def progress(report):
+            message = (f"Importação: {report.progress:.0%} - {report.read} linhas, "
+                       f"{report.rejected_count} recusadas ({report.rows_per_second:,.0f}/s)")
+            self.after(0, self.log, message)
+
+        def finished(report):
+            self.btn_import.config(state="normal")
+            if report is None:
+                self.log("❌ Importação interrompida por erro no banco (lotes anteriores foram gravados).")
+                return
+            for line, sku, reason in report.rejected[:10]:
+                self.log(f"   linha {line}: {sku!r} - {reason}")
+            self.log(f"✅ Importação concluída: {report.summary()}")
+            if not dry_run and report.written:
+                self.outbox.wake(report.written)
+                self.refresh_data()
+
+        self.run_in_background(
+            lambda: import_stock_file(path, dry_run=dry_run, on_progress=progress),
+            finished,
+            lambda _exc: self.btn_import.config(state="normal")
+        )
+
+    def _on_slow_query(self, name, elapsed, rows):
+        """Chamado pela thread da consulta quando ela passa de DB_SLOW_QUERY_MS."""
+        rows_text = f", {rows} linhas" if rows is not None else ""
+        try:
+            self.after(0, self.log, f"🐢 Banco lento: {name} levou {elapsed * 1000:.0f} ms{rows_text}")
+        except (RuntimeError, tk.TclError):
+            pass  # Janela já foi fechada
+
+    def _on_outbox_result(self, sku, ok, error):
+        """Chamado pela thread do despachante da outbox para cada SKU enviado."""
+        def apply():
+            if ok:
+                self.log(f"✅ SHOPEE ATUALIZADA! SKU {sku}")
+                self._update_row(None, sku, status="Sincronizado")
+            else:
+                self.log(f"❌ Erro Shopee ({sku}): {error}. Nova tentativa automática.")
+                self._update_row(None, sku, status="Erro API")
+
+        try:
+            self.after(0, apply)
+        except (RuntimeError, tk.TclError):
+            pass  # Janela já foi fechada
+
+    def _handle_close(self):
+        self.db_executor.shutdown(wait=False, cancel_futures=True)
+        self.outbox.stop(timeout=1)
+        db_metrics.remove_slow_listener(self._on_slow_query)
+        if self._metrics_stop is not None:
+            self._metrics_stop.set()
+        self.destroy()
+
     # ---------------------------- ADMIN TAB ---------------------------- #
     def load_users_table(self):
         if not self.admin_tab:
@@ -524,12 +698,19 @@ class ERPApp(tk.Tk):
     def add_limited_user(self):
         username = self.new_user_var.get().strip()
         password = self.new_pass_var.get().strip()
-        ok, msg = self.user_store.add_user(username, password)
-        self.user_feedback_var.set(msg)
-        if ok:
-            self.new_user_var.set("")
-            self.new_pass_var.set("")
-            self.load_users_table()
+        self.user_feedback_var.set("Criando usuário...")
+
+        def done(result):
+            ok, msg = result
+            self.user_feedback_var.set(msg)
+            if ok:
+                self.new_user_var.set("")
+                self.new_pass_var.set("")
+                self.load_users_table()
+
+        # add_user calcula o hash da senha (lento de propósito): fora da thread do Tk
+        self.run_in_background(lambda: self.user_store.add_user(username, password), done,
+                               lambda exc: self.user_feedback_var.set(f"Erro ao criar usuário: {exc}"))
 
     def remove_selected_user(self):
         selection = self.user_tree.selection()
@@ -0,0 +1,276 @@
+"""
+Esquema versionado do banco do ERP.
+
+Cada migração tem um número, uma descrição e uma função que recebe o cursor.
+As aplicadas ficam registradas em schema_version; migrate() roda só as pendentes,
+em ordem. Uma migração que depende de correção manual nos dados lança MigrationError:
+ela é pulada (sem registro, com aviso) e as seguintes continuam rodando. Os passos
+conferem o information_schema antes de criar colunas e índices, então rodar de novo
+(ou num banco já ajustado à mão) não quebra nada.
+"""
+from mysql.connector import Error
+
+SCHEMA_VERSION_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        descricao VARCHAR(200) NOT NULL,
+        aplicado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+MIGRATION_LOCK = "erp_schema_migrations"
+MIGRATION_LOCK_TIMEOUT = 30  # segundos esperando outro processo terminar de migrar
+
+EXPLAIN_MIN_ROWS = 1000  # Tabelas menores que isso podem ser varridas sem aviso
+
+
+class MigrationError(Exception):
+    """Migração que não pode ser aplicada sem intervenção (ex.: SKUs duplicados)."""
+
+
+# --- AUXILIARES (idempotentes) ---
+def _columns(cursor, table):
+    cursor.execute("""
+        SELECT COLUMN_NAME FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def _has_index(cursor, table, columns, unique=False):
+    """True se algum índice da tabela começa exatamente por 'columns' (e é UNIQUE, se pedido)."""
+    cursor.execute("""
+        SELECT INDEX_NAME, NON_UNIQUE, COLUMN_NAME FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        ORDER BY INDEX_NAME, SEQ_IN_INDEX
+    """, (table,))
+    indexes = {}
+    for name, non_unique, column in cursor.fetchall():
+        entry = indexes.setdefault(name, [not non_unique, []])
+        entry[1].append(column.lower())
+
+    wanted = [column.lower() for column in columns]
+    for is_unique, cols in indexes.values():
+        if unique:
+            # Unicidade só vale se o índice tiver exatamente essas colunas
+            if is_unique and cols == wanted:
+                return True
+        elif cols[:len(wanted)] == wanted:
+            return True
+    return False
+
+
+def _add_column(cursor, table, column, definition):
+    if column not in _columns(cursor, table):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _add_index(cursor, table, name, columns, unique=False):
+    if not _has_index(cursor, table, columns, unique):
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        cursor.execute(f"ALTER TABLE {table} ADD {kind} {name} ({', '.join(columns)})")
+
+
+# --- MIGRAÇÕES ---
+def _m001_base_tables(cursor):
+    """Tabelas que o sistema sempre usou (em bancos existentes, não faz nada)."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS produtos (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            sku VARCHAR(100) NOT NULL,
+            nome VARCHAR(255) NOT NULL,
+            preco DECIMAL(10, 2) NOT NULL DEFAULT 0,
+            estoque_real INT NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS mapeamento_plataforma (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            produto_sku VARCHAR(100) NOT NULL,
+            plataforma VARCHAR(20) NOT NULL,
+            remote_item_id BIGINT NULL
+        )
+    """)
+
+
+def _m002_unique_sku(cursor):
+    if _has_index(cursor, "produtos", ["sku"], unique=True):
+        return
+    cursor.execute("""
+        SELECT sku, COUNT(*) FROM produtos GROUP BY sku HAVING COUNT(*) > 1 LIMIT 20
+    """)
+    duplicates = cursor.fetchall()
+    if duplicates:
+        listed = ", ".join(f"{sku} ({count}x)" for sku, count in duplicates)
+        raise MigrationError(f"SKUs duplicados em produtos, corrija antes de migrar: {listed}")
+    _add_index(cursor, "produtos", "uq_produtos_sku", ["sku"], unique=True)
+
+
+def _m003_mapping_index(cursor):
+    # JOIN das listagens: ON p.sku = m.produto_sku AND m.plataforma = 'SHOPEE'
+    _add_index(cursor, "mapeamento_plataforma", "idx_mapeamento_plataforma_sku",
+               ["plataforma", "produto_sku"])
+
+
+def _m004_sync_outbox(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sync_outbox (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            plataforma VARCHAR(20) NOT NULL,
+            produto_sku VARCHAR(100) NOT NULL,
+            remote_item_id BIGINT NOT NULL,
+            remote_model_id BIGINT NOT NULL DEFAULT 0,
+            quantidade INT NOT NULL,
+            status VARCHAR(12) NOT NULL DEFAULT 'PENDENTE',
+            tentativas INT NOT NULL DEFAULT 0,
+            ultimo_erro TEXT NULL,
+            proxima_tentativa DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            criado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            atualizado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            KEY idx_outbox_fila (status, proxima_tentativa, id),
+            KEY idx_outbox_item (remote_item_id, remote_model_id, status)
+        )
+    """)
+
+
+def _m005_remote_stock_columns(cursor):
+    # Último estoque confirmado pela Shopee (base da sincronização por delta)
+    _add_column(cursor, "mapeamento_plataforma", "estoque_remoto_confirmado", "INT NULL")
+    _add_column(cursor, "mapeamento_plataforma", "confirmado_em", "DATETIME NULL")
+
+
+def _m006_catalog_updated_at(cursor):
+    # Carimbo usado pelo catálogo em memória para buscar só o que mudou
+    _add_column(cursor, "produtos", "atualizado_em",
+                "TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP")
+    _add_index(cursor, "produtos", "idx_produtos_atualizado_em", ["atualizado_em"])
+
+
+def _m007_pull_sync(cursor):
+    # Sincronização de entrada (pull_sync.py): marca d'água por tarefa e pedidos já aplicados
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sync_watermark (
+            nome VARCHAR(50) PRIMARY KEY,
+            valor BIGINT NOT NULL,
+            atualizado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS pedidos_marketplace (
+            plataforma VARCHAR(20) NOT NULL,
+            pedido_id VARCHAR(64) NOT NULL,
+            status VARCHAR(30) NOT NULL,
+            situacao VARCHAR(10) NOT NULL,
+            atualizado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (plataforma, pedido_id)
+        )
+    """)
+    # Itens dos pedidos chegam por remote_item_id
+    _add_index(cursor, "mapeamento_plataforma", "idx_mapeamento_plataforma_item",
+               ["plataforma", "remote_item_id"])
+
+
+def _m008_mapping_updated_at(cursor):
+    # Vínculos criados/alterados por outro processo também entram na atualização incremental do catálogo
+    _add_column(cursor, "mapeamento_plataforma", "atualizado_em",
+                "TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP")
+    _add_index(cursor, "mapeamento_plataforma", "idx_mapeamento_atualizado_em", ["atualizado_em"])
+
+
+UNIQUE_SKU_VERSION = 2  # Sem ela add_products_bulk pode gravar SKUs repetidos
+
+MIGRATIONS = [
+    (1, "tabelas produtos e mapeamento_plataforma", _m001_base_tables),
+    (2, "SKU único em produtos", _m002_unique_sku),
+    (3, "índice (plataforma, produto_sku) no mapeamento", _m003_mapping_index),
+    (4, "tabela sync_outbox", _m004_sync_outbox),
+    (5, "estoque remoto confirmado no mapeamento", _m005_remote_stock_columns),
+    (6, "produtos.atualizado_em para o catálogo em memória", _m006_catalog_updated_at),
+    (7, "marca d'água e pedidos da sincronização de entrada", _m007_pull_sync),
+    (8, "mapeamento_plataforma.atualizado_em para o catálogo em memória", _m008_mapping_updated_at),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# --- EXECUÇÃO ---
+def applied_versions(cursor):
+    cursor.execute(SCHEMA_VERSION_DDL)
+    cursor.execute("SELECT version FROM schema_version")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(conn):
+    """
+    Aplica as migrações pendentes na conexão informada e retorna (aplicadas, puladas):
+    [(versão, descrição)] das que rodaram e [(versão, descrição, motivo)] das que lançaram
+    MigrationError (ficam pendentes sem bloquear as seguintes). Um lock nomeado do MySQL
+    impede dois processos migrando ao mesmo tempo. Lança mysql.connector.Error se uma
+    migração falhar (as anteriores ficam registradas; a que falhou roda de novo na próxima vez).
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            raise MigrationError("outro processo está aplicando migrações; tente novamente")
+
+        try:
+            done = applied_versions(cursor)
+            applied, skipped = [], []
+            for version, description, step in MIGRATIONS:
+                if version in done:
+                    continue
+                try:
+                    step(cursor)
+                except MigrationError as e:
+                    conn.rollback()
+                    skipped.append((version, description, str(e)))
+                    continue
+                cursor.execute("INSERT INTO schema_version (version, descricao) VALUES (%s, %s)",
+                               (version, description))
+                conn.commit()
+                applied.append((version, description))
+            return applied, skipped
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+            cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def pending_migrations(conn):
+    cursor = conn.cursor()
+    try:
+        done = applied_versions(cursor)
+        return [(version, description) for version, description, _ in MIGRATIONS
+                if version not in done]
+    finally:
+        cursor.close()
+
+
+def explain_queries(conn, queries, min_rows=EXPLAIN_MIN_ROWS):
+    """
+    Roda EXPLAIN em cada consulta de 'queries' [(nome, sql, params, tabelas que podem ser
+    varridas)] e retorna avisos para cada tabela lida por varredura completa (type = ALL)
+    com pelo menos 'min_rows' linhas estimadas.
+    """
+    warnings = []
+    cursor = conn.cursor(dictionary=True)
+    try:
+        for name, sql, params, allowed_scans in queries:
+            try:
+                cursor.execute(f"EXPLAIN {sql}", params)
+                plan = cursor.fetchall()
+            except Error as e:
+                warnings.append(f"{name}: EXPLAIN falhou ({e})")
+                continue
+            for step in plan:
+                table = step.get('table')
+                if (step.get('type') == 'ALL' and table not in allowed_scans
+                        and (step.get('rows') or 0) >= min_rows):
+                    warnings.append(f"{name}: varredura completa em '{table}' "
+                                    f"(~{step['rows']} linhas, índices possíveis: "
+                                    f"{step.get('possible_keys') or 'nenhum'})")
+    finally:
+        cursor.close()
+    return warnings
@@ -0,0 +1,167 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import config
+import database
+from shopee_sync import ShopeeSyncEngine
+
+OUTBOX_BATCH_SIZE = 200
+OUTBOX_POLL_INTERVAL = 5.0    # segundos entre verificações quando a fila está vazia
+OUTBOX_MAX_ATTEMPTS = 10
+OUTBOX_RETRY_BASE = 15        # segundos; dobra a cada tentativa
+OUTBOX_RETRY_MAX = 3600
+OUTBOX_STALE_CHECK_INTERVAL = 60  # segundos entre liberações de pendências presas em PROCESSANDO
+
+
+@contextmanager
+def heartbeat(jobs, interval=None):
+    """
+    Enquanto o bloco roda, renova as pendências reservadas a cada 'interval' segundos
+    (config.OUTBOX_HEARTBEAT_INTERVAL): um lote lento não é dado como preso e reenviado.
+    """
+    interval = config.OUTBOX_HEARTBEAT_INTERVAL if interval is None else interval
+    ids = [job['id'] for job in jobs]
+    done = threading.Event()
+
+    def beat():
+        while not done.wait(interval):
+            database.touch_outbox_jobs(ids)
+
+    thread = threading.Thread(target=beat, name="outbox-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        done.set()
+        thread.join()
+
+
+def retry_delay(job):
+    """Espera até a próxima tentativa: exponencial no número de tentativas, com jitter."""
+    ceiling = min(OUTBOX_RETRY_MAX, OUTBOX_RETRY_BASE * (2 ** job['tentativas']))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+class OutboxDispatcher:
+    """
+    Thread em segundo plano que drena a sync_outbox em lotes.
+    Reserva um lote de pendências, envia pelo ShopeeSyncEngine (várias ao mesmo tempo)
+    e marca cada uma como enviada ou devolve para a fila com backoff.
+    'on_result(sku, ok, erro)' é chamado (na thread do despachante) para cada SKU processado.
+
+    Coalescência: depois de um aviso de pendência nova, espera 'coalesce_window' segundos
+    (ou até 'coalesce_max' avisos) antes de enviar. Várias edições seguidas do mesmo
+    item/modelo caem no mesmo lote e só a última quantidade vai para a Shopee.
+    """
+
+    def __init__(self, engine=None, batch_size=OUTBOX_BATCH_SIZE,
+                 interval=OUTBOX_POLL_INTERVAL, on_result=None,
+                 coalesce_window=None, coalesce_max=None):
+        self.engine = engine or ShopeeSyncEngine()
+        self.batch_size = batch_size
+        self.interval = interval
+        self.on_result = on_result
+        self.coalesce_window = (config.SHOPEE_COALESCE_WINDOW
+                                if coalesce_window is None else coalesce_window)
+        self.coalesce_max = config.SHOPEE_COALESCE_MAX if coalesce_max is None else coalesce_max
+
+        self._cond = threading.Condition()
+        self._notified = 0  # Avisos de pendência nova desde o último envio
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.sent = 0
+        self.coalesced = 0  # Pendências que não viraram chamada própria
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def wake(self, count=1):
+        """Avisa que há 'count' pendências novas, sem esperar o próximo intervalo."""
+        with self._cond:
+            self._notified += count
+            self._cond.notify_all()
+
+    def _wait_for_work(self):
+        with self._cond:
+            # Fila (quase) vazia: dorme até um aviso ou até o intervalo
+            if not self._notified and not self._stop.is_set():
+                self._cond.wait(self.interval)
+
+            if self._notified and self.coalesce_window > 0:
+                # Janela de coalescência: junta as edições que chegarem logo em seguida
+                deadline = time.monotonic() + self.coalesce_window
+                while self._notified < self.coalesce_max and not self._stop.is_set():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            self._notified = 0
+
+    def _run(self):
+        next_release = 0.0
+        while not self._stop.is_set():
+            # Não só na partida: um lote cuja conclusão não foi gravada (queda do banco) ou
+            # um despachante de outro processo que morreu deixam pendências em PROCESSANDO
+            if time.monotonic() >= next_release:
+                database.release_stale_outbox_jobs()
+                next_release = time.monotonic() + OUTBOX_STALE_CHECK_INTERVAL
+            try:
+                claimed = self.drain_once()
+            except Exception as exc:
+                print(f"Erro no despachante da outbox: {exc}")
+                claimed = 0
+
+            if claimed < self.batch_size:
+                self._wait_for_work()
+
+    def drain_once(self):
+        """Processa um lote. Retorna quantas pendências foram reservadas."""
+        jobs = database.claim_outbox_batch(self.batch_size)
+        if not jobs:
+            return 0
+
+        # Pendências por item: o engine envia todos os modelos de um item numa chamada
+        jobs_by_item = {}
+        for job in jobs:
+            jobs_by_item.setdefault(job['remote_item_id'], []).append(job)
+
+        # Mesmo item/modelo repetido no lote: o engine envia só a última quantidade
+        updates = [(job['remote_item_id'], job['remote_model_id'], job['quantidade']) for job in jobs]
+        unique_models = len({(item_id, model_id) for item_id, model_id, _ in updates})
+        self.coalesced += len(jobs) - unique_models
+        self.sent += unique_models
+        with heartbeat(jobs):
+            report = self.engine.push_stock(updates)
+
+        done, failures = [], []
+        for item_id, item_jobs in jobs_by_item.items():
+            error = report.failed.get(item_id)
+            if error is None:
+                done.extend(item_jobs)
+            else:
+                failures.extend((job, error) for job in item_jobs)
+
+        database.complete_outbox_jobs(done)
+        database.fail_outbox_jobs(failures, OUTBOX_MAX_ATTEMPTS, retry_delay)
+
+        if self.on_result:
+            results = {job['produto_sku']: (True, None) for job in done}
+            results.update({job['produto_sku']: (False, error) for job, error in failures})
+            for sku, (ok, error) in results.items():
+                self.on_result(sku, ok, error)
+
+        return len(jobs)
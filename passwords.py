@@ -0,0 +1,98 @@
+"""
+Hash de senhas com KDF do hashlib (PBKDF2-SHA256 ou scrypt), com sal e custo ajustável.
+
+Formato gravado (o custo viaja junto, então dá para aumentar sem invalidar senhas antigas):
+    pbkdf2_sha256$<iterações>$<sal base64>$<hash base64>
+    scrypt$<n>$<r>$<p>$<sal base64>$<hash base64>
+Qualquer outro valor é tratado como senha antiga em texto puro (aceita, mas pede rehash).
+"""
+import base64
+import hashlib
+import hmac
+import os
+
+import config
+from query_cache import QueryCache
+
+SALT_BYTES = 16
+VERIFIED_CACHE_SIZE = 256
+VERIFIED_CACHE_TTL = 15 * 60  # segundos
+
+# Logins já verificados neste processo: HMAC(chave aleatória, hash gravado + senha) -> True.
+# Repetir o login (ex.: trocar de usuário e voltar) não paga o custo do KDF de novo;
+# a chave nunca sai da memória, então o cache não serve para atacar as senhas.
+_cache_key = os.urandom(32)
+_verified = QueryCache(max_entries=VERIFIED_CACHE_SIZE, ttl=VERIFIED_CACHE_TTL)
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def _derive(algorithm, params, password, salt):
+    if algorithm == "pbkdf2_sha256":
+        (iterations,) = params
+        return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    if algorithm == "scrypt":
+        n, r, p = params
+        return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                              maxmem=128 * r * n * 2, dklen=32)
+    raise ValueError(f"algoritmo de senha desconhecido: {algorithm}")
+
+
+def _current_params():
+    if config.PASSWORD_HASH_ALGORITHM == "scrypt":
+        return "scrypt", (config.PASSWORD_SCRYPT_N, config.PASSWORD_SCRYPT_R, config.PASSWORD_SCRYPT_P)
+    return "pbkdf2_sha256", (config.PASSWORD_PBKDF2_ITERATIONS,)
+
+
+def _parse(stored):
+    """(algoritmo, parâmetros, sal, hash) ou None se 'stored' não for um hash reconhecido."""
+    parts = str(stored).split("$")
+    try:
+        if parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+            return parts[0], (int(parts[1]),), base64.b64decode(parts[2]), base64.b64decode(parts[3])
+        if parts[0] == "scrypt" and len(parts) == 6:
+            params = (int(parts[1]), int(parts[2]), int(parts[3]))
+            return parts[0], params, base64.b64decode(parts[4]), base64.b64decode(parts[5])
+    except ValueError:
+        return None
+    return None
+
+
+def is_hashed(stored):
+    return _parse(stored) is not None
+
+
+def hash_password(password):
+    """Hash novo com o algoritmo e o custo configurados (sal aleatório a cada chamada)."""
+    algorithm, params = _current_params()
+    salt = os.urandom(SALT_BYTES)
+    digest = _derive(algorithm, params, password, salt)
+    return "$".join([algorithm, *(str(value) for value in params), _b64(salt), _b64(digest)])
+
+
+def needs_rehash(stored):
+    """True se a senha está em texto puro ou com algoritmo/custo diferente do configurado."""
+    parsed = _parse(stored)
+    return parsed is None or (parsed[0], parsed[1]) != _current_params()
+
+
+def verify_password(password, stored):
+    """Confere a senha contra o valor gravado (hash ou texto puro antigo), em tempo constante."""
+    if not stored or password is None:
+        return False
+    cache_key = hmac.new(_cache_key, f"{stored}\0{password}".encode("utf-8"), hashlib.sha256).digest()
+    if _verified.get(cache_key):
+        return True
+
+    parsed = _parse(stored)
+    if parsed is None:
+        ok = hmac.compare_digest(str(stored).encode("utf-8"), password.encode("utf-8"))
+    else:
+        algorithm, params, salt, expected = parsed
+        ok = hmac.compare_digest(_derive(algorithm, params, password, salt), expected)
+
+    if ok:
+        _verified.put(cache_key, True)
+    return ok
@@ -0,0 +1,158 @@
+from array import array
+from collections.abc import Mapping
+
+from search_index import sku_key
+
+PRODUCT_FIELDS = ("id", "sku", "nome", "estoque_real", "shopee_id")
+
+
+class ProductRow(Mapping):
+    """
+    Visão de uma linha de ProductColumns com a mesma interface de dict das linhas de
+    PRODUCT_SELECT (row['sku'], row.get('shopee_id'), dict(row)...). Não copia os dados.
+    """
+
+    __slots__ = ("_columns", "_index")
+
+    def __init__(self, columns, index):
+        self._columns = columns
+        self._index = index
+
+    def __getitem__(self, key):
+        return self._columns.value(self._index, key)
+
+    def __iter__(self):
+        return iter(PRODUCT_FIELDS)
+
+    def __len__(self):
+        return len(PRODUCT_FIELDS)
+
+    def __repr__(self):
+        return f"ProductRow({dict(self)!r})"
+
+
+class ProductColumns:
+    """
+    Lista de produtos guardada por colunas: ids, estoques e IDs Shopee em array('q')
+    (8 bytes por valor) e SKU/nome em listas de str. Não existe um dict por produto;
+    rows[i] devolve uma ProductRow que lê direto das colunas.
+    shopee_id ausente é guardado como 0 e devolvido como None.
+    """
+
+    __slots__ = ("ids", "skus", "nomes", "estoques", "shopee_ids", "_sku_index")
+
+    def __init__(self):
+        self.ids = array("q")
+        self.skus = []
+        self.nomes = []
+        self.estoques = array("q")
+        self.shopee_ids = array("q")
+        self._sku_index = None  # SKU em maiúsculas -> posição (montado na primeira busca)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Monta a partir de dicts/ProductRow (id, sku, nome, estoque_real, shopee_id)."""
+        columns = cls()
+        columns.extend(rows)
+        return columns
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return (ProductRow(self, index) for index in range(len(self.ids)))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ProductColumns.from_rows(ProductRow(self, i) for i in range(*index.indices(len(self))))
+        if index < 0:
+            index += len(self.ids)
+        if not 0 <= index < len(self.ids):
+            raise IndexError("índice fora da lista de produtos")
+        return ProductRow(self, index)
+
+    def append(self, product_id, sku, nome, estoque_real, shopee_id=None):
+        if self._sku_index is not None:
+            self._sku_index[sku_key(sku)] = len(self.ids)
+        self.ids.append(product_id)
+        self.skus.append(sku)
+        self.nomes.append(nome)
+        self.estoques.append(estoque_real)
+        self.shopee_ids.append(shopee_id or 0)
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row['id'], row['sku'], row['nome'], row['estoque_real'], row['shopee_id'])
+
+    def value(self, index, field):
+        if field == "id":
+            return self.ids[index]
+        if field == "sku":
+            return self.skus[index]
+        if field == "nome":
+            return self.nomes[index]
+        if field == "estoque_real":
+            return self.estoques[index]
+        if field == "shopee_id":
+            return self.shopee_ids[index] or None
+        raise KeyError(field)
+
+    def set_stock(self, index, quantity):
+        self.estoques[index] = quantity
+
+    def index_of(self, sku):
+        """Posição do SKU (comparado por sku_key) ou None."""
+        if self._sku_index is None:
+            self._sku_index = {}
+            for index, value in enumerate(self.skus):
+                self._sku_index.setdefault(sku_key(value), index)
+        return self._sku_index.get(sku_key(sku))
+
+    def copy(self):
+        clone = ProductColumns()
+        clone.ids = array("q", self.ids)
+        clone.skus = list(self.skus)
+        clone.nomes = list(self.nomes)
+        clone.estoques = array("q", self.estoques)
+        clone.shopee_ids = array("q", self.shopee_ids)
+        return clone
+
+    def to_dicts(self):
+        """Lista de dicts no formato antigo (para código que ainda espera dicts)."""
+        return [dict(row) for row in self]
+
+
+class ProductTableRows:
+    """
+    Backing store da VirtualTree de produtos em cima de ProductColumns.
+    rows[i] monta na hora a tupla exibida (sku, nome, estoque, ID Shopee, status);
+    só os status diferentes do padrão ficam guardados (dict esparso).
+    """
+
+    DEFAULT_STATUS = "Aguardando"
+
+    def __init__(self, columns=None):
+        self.columns = columns if columns is not None else ProductColumns()
+        self.status = {}
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __getitem__(self, index):
+        columns = self.columns
+        return (columns.skus[index], columns.nomes[index], columns.estoques[index],
+                columns.shopee_ids[index] or "---", self.status.get(index, self.DEFAULT_STATUS))
+
+    def __setitem__(self, index, values):
+        """Aceita a tupla exibida: grava estoque e status (SKU/nome/ID não mudam pela tabela)."""
+        self.columns.set_stock(index, int(values[2]))
+        if values[4] == self.DEFAULT_STATUS:
+            self.status.pop(index, None)
+        else:
+            self.status[index] = values[4]
+
+    def extend(self, rows):
+        self.columns.extend(rows)
+
+    def index_of(self, sku):
+        return self.columns.index_of(sku)
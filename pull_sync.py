@@ -0,0 +1,105 @@
+import time
+
+import database
+from shopee_client import ShopeeAPIError, ShopeeClient
+
+ORDERS_WATERMARK = "shopee_pedidos"
+PULL_OVERLAP = 300              # segundos relidos a cada rodada (pedidos que mudam com atraso)
+FIRST_PULL_WINDOW = 24 * 3600   # primeira execução: pedidos das últimas 24h
+
+
+def pull_orders(client=None, since=None):
+    """
+    Sincronização de entrada por pedidos: lê os pedidos criados/alterados na Shopee desde a
+    última rodada (marca d'água em sync_watermark) e aplica as vendas e cancelamentos ao
+    estoque local numa única transação. Pedidos já aplicados são ignorados, então reler
+    uma janela é seguro. Custo: algumas chamadas paginadas por rodada, não uma por SKU.
+    Retorna o resultado de database.apply_marketplace_orders, mais 'itens_atualizados'
+    ({remote_item_id: maior update_time dos pedidos lidos}), ou None em caso de erro.
+    """
+    started = time.monotonic()
+    client = client or ShopeeClient()
+    now = int(time.time())
+    if since is None:
+        last = database.get_sync_watermark(ORDERS_WATERMARK)
+        since = last - PULL_OVERLAP if last else now - FIRST_PULL_WINDOW
+
+    try:
+        order_sns = client.get_order_list(since, now)
+        details = client.get_order_details(order_sns)
+    except ShopeeAPIError as exc:
+        print(f"Erro ao ler pedidos da Shopee: {exc}")
+        return None
+
+    orders = [{
+        "pedido_id": order["order_sn"],
+        "status": order.get("order_status", ""),
+        "itens": [(item["item_id"], item.get("model_quantity_purchased", 0))
+                  for item in order.get("item_list") or []],
+    } for order in details]
+
+    updated_items = {}
+    for order in details:
+        update_time = int(order.get("update_time") or now)
+        for item in order.get("item_list") or []:
+            updated_items[item["item_id"]] = max(update_time, updated_items.get(item["item_id"], 0))
+
+    resultado = database.apply_marketplace_orders(orders, ORDERS_WATERMARK, now)
+    if resultado is not None:
+        resultado["itens_atualizados"] = updated_items
+        print(f"Pedidos Shopee: {len(orders)} lidos, {resultado['baixados']} baixados, "
+              f"{resultado['estornados']} estornados, {len(resultado['skus'])} SKUs alterados "
+              f"em {time.monotonic() - started:.1f}s.")
+    return resultado
+
+
+def pull_remote_stock(client=None, adopt=False):
+    """
+    Compara o estoque atual dos anúncios na Shopee com o último valor confirmado.
+    Divergência = alteração feita direto na Shopee. Para não confundir com uma venda ainda
+    não lida, o estoque remoto é lido primeiro, depois pull_orders aplica os pedidos até
+    agora e só então a comparação é feita (com o confirmado já descontado das vendas).
+    Itens com pedidos alterados a partir de PULL_OVERLAP segundos antes da leitura ficam
+    de fora (a venda pode ou não estar no valor lido), assim como os com envio pendente
+    na outbox antes ou depois da leitura. Com adopt=True a diferença é aplicada ao estoque local.
+    Retorna [(sku, item_id, remoto, confirmado)] ou None em caso de erro.
+    """
+    client = client or ShopeeClient()
+    read_at = int(time.time())
+    before = database.get_shopee_listings()
+    item_ids = list({listing['remote_item_id'] for listing in before})
+    # Envio em andamento durante a leitura: o valor lido pode ser o antigo ou o novo
+    pending = {listing['remote_item_id'] for listing in before if listing['pendente']}
+
+    try:
+        stock = client.get_item_stock(item_ids)
+    except ShopeeAPIError as exc:
+        print(f"Erro ao ler estoque da Shopee: {exc}")
+        return None
+
+    orders = pull_orders(client)
+    if orders is None:
+        return None
+    recent = {item_id for item_id, update_time in orders["itens_atualizados"].items()
+              if update_time >= read_at - PULL_OVERLAP}
+
+    skipped = recent | pending
+    listings = [listing for listing in database.get_shopee_listings()
+                if not listing['pendente'] and listing['estoque_remoto_confirmado'] is not None
+                and listing['remote_item_id'] not in skipped]
+
+    divergent = []
+    for listing in listings:
+        models = stock.get(listing['remote_item_id'])
+        if models is None:
+            continue
+        remote = sum(models.values())
+        if remote != listing['estoque_remoto_confirmado']:
+            divergent.append((listing['sku'], listing['remote_item_id'], remote,
+                              listing['estoque_remoto_confirmado']))
+
+    print(f"Estoque Shopee: {len(listings)} anúncios conferidos, {len(divergent)} divergentes"
+          + (f", {len(recent)} com pedidos recentes ignorados." if recent else "."))
+    if adopt and divergent and not database.adopt_remote_stock(divergent):
+        return None
+    return divergent
@@ -0,0 +1,52 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class QueryCache:
+    """
+    Cache LRU com tempo de vida (TTL) para resultados de consultas.
+    Guarda no máximo 'max_entries' resultados; os menos usados saem primeiro
+    e qualquer entrada mais velha que 'ttl' segundos é ignorada.
+    """
+
+    def __init__(self, max_entries=64, ttl=30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # chave -> (momento em que entrou, valor)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _alive(self, stored_at):
+        return time.monotonic() - stored_at < self.ttl
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._alive(entry[0]):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value, stored_at=None):
+        """'stored_at' permite herdar a idade de um resultado derivado de outro já em cache."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() if stored_at is None else stored_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def items(self):
+        """Trios (chave, valor, momento em que entrou) ainda válidos, do mais recente ao mais antigo."""
+        with self._lock:
+            return [(key, value, stored_at) for key, (stored_at, value) in reversed(self._entries.items())
+                    if self._alive(stored_at)]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,129 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket thread-safe com taxa adaptativa.
+    - acquire() bloqueia até haver uma ficha (no máximo 'rate' por segundo, rajadas até 'burst').
+    - throttled() reduz a taxa pela metade e pausa o balde (ex.: Retry-After);
+      cada sucesso devolve um pouco da taxa até o limite configurado.
+    """
+
+    def __init__(self, rate, burst=None, min_rate=0.5):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = min(min_rate, self.max_rate)
+        self.burst = float(burst or max(1.0, rate))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+        self.waiting = 0
+        self.acquired = 0
+        self.throttles = 0
+        self.total_wait = 0.0
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Pega uma ficha, esperando se preciso. Retorna quantos segundos esperou."""
+        started = time.monotonic()
+        with self._lock:
+            self.waiting += 1
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if now >= self._paused_until and self._tokens >= 1:
+                        self._tokens -= 1
+                        self.acquired += 1
+                        waited = now - started
+                        self.total_wait += waited
+                        return waited
+                    delay = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+                time.sleep(delay)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+    def throttled(self, pause=0.0):
+        """A API recusou por excesso de requisições: diminui a taxa e pausa todo mundo."""
+        with self._lock:
+            self.throttles += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+
+    def succeeded(self):
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+class RateLimiter:
+    """
+    Um TokenBucket por path da API, compartilhado por todas as threads.
+    Paths sem taxa própria em 'per_path' usam 'default_rate'.
+    """
+
+    def __init__(self, default_rate, per_path=None):
+        self.default_rate = default_rate
+        self.per_path = dict(per_path or {})
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+        self.retries = 0
+
+    def bucket(self, path):
+        with self._lock:
+            bucket = self._buckets.get(path)
+            if bucket is None:
+                bucket = TokenBucket(self.per_path.get(path, self.default_rate))
+                self._buckets[path] = bucket
+            return bucket
+
+    def acquire(self, path):
+        return self.bucket(path).acquire()
+
+    def throttled(self, path, pause=0.0):
+        self.bucket(path).throttled(pause)
+
+    def succeeded(self, path):
+        self.bucket(path).succeeded()
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def stats(self):
+        """Fila de espera, recusas e taxa atual por path."""
+        with self._lock:
+            buckets = dict(self._buckets)
+            retries = self.retries
+        return {
+            "retries": retries,
+            "paths": {
+                path: {
+                    "waiting": bucket.waiting,
+                    "acquired": bucket.acquired,
+                    "throttles": bucket.throttles,
+                    "rate": round(bucket.rate, 2),
+                    "total_wait_s": round(bucket.total_wait, 3),
+                }
+                for path, bucket in buckets.items()
+            },
+        }
+
+
+def parse_rates(spec):
+    """Lê taxas por path no formato '/api/v2/a=5,/api/v2/b=2' (usado no .env)."""
+    rates = {}
+    for part in (spec or "").split(","):
+        if "=" in part:
+            path, rate = part.rsplit("=", 1)
+            rates[path.strip()] = float(rate)
+    return rates
@@ -0,0 +1,40 @@
+import time
+
+import database
+from outbox import OutboxDispatcher
+from shopee_sync import ShopeeSyncEngine
+
+
+def reconcile_stock(full=False, dispatcher=None, workers=None):
+    """
+    Sincronização por delta: enfileira só os anúncios cujo estoque local difere do
+    último valor confirmado pela Shopee e drena a fila até esvaziar.
+    Com 'dispatcher' rodando em segundo plano (ex.: a GUI), apenas o acorda;
+    senão envia com 'workers' requisições simultâneas.
+    Retorna (pendências criadas, envios feitos agora).
+    """
+    started = time.monotonic()
+    queued = database.enqueue_stock_deltas(full)
+    if queued is None:
+        return None, 0
+
+    print(f"Reconciliação: {queued} anúncios com estoque diferente do confirmado na Shopee.")
+    if dispatcher is not None:
+        dispatcher.wake(queued)
+        return queued, 0
+
+    # Execução avulsa (cron/CLI): drena com um despachante próprio, sem thread
+    dispatcher = OutboxDispatcher(ShopeeSyncEngine(max_workers=workers), coalesce_window=0)
+    processed = 0
+    try:
+        while True:
+            claimed = dispatcher.drain_once()
+            if not claimed:
+                break
+            processed += claimed
+    finally:
+        dispatcher.engine.shutdown()
+
+    print(f"Reconciliação concluída: {processed} pendências processadas "
+          f"em {time.monotonic() - started:.1f}s.")
+    return queued, processed
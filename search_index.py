@@ -0,0 +1,176 @@
+import bisect
+import re
+import threading
+import unicodedata
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text):
+    """Minúsculas e sem acentos: 'Calção Açaí' -> 'calcao acai'."""
+    decomposed = unicodedata.normalize("NFKD", str(text).lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def sku_key(sku):
+    """
+    Chave para comparar SKUs no Python como o MySQL compara a coluna produtos.sku.
+    Aproximação da collation utf8mb4 *_ai_ci: ignora maiúsculas e acentos, 'ß' = 'ss'
+    e espaços no final ('ABC1 ' = 'abc1'). Use em todo dict/set indexado por SKU.
+    """
+    decomposed = unicodedata.normalize("NFKD", str(sku).casefold())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).rstrip(" ")
+
+
+def tokenize(text):
+    """Palavras normalizadas do texto (separa por espaço, hífen, barra etc.)."""
+    return _TOKEN_RE.findall(normalize(text))
+
+
+def _score(words, term_norm, sku_norm, tokens):
+    """Relevância de um produto para a busca, ou None se alguma palavra não casar."""
+    score = 0
+    for word in words:
+        if word in tokens:
+            score += 10
+        elif any(token.startswith(word) for token in tokens):
+            score += 5
+        else:
+            return None
+    if sku_norm == term_norm:
+        score += 100
+    elif sku_norm.startswith(term_norm):
+        score += 50
+    return score
+
+
+def narrows(term, broader_term):
+    """
+    True se todo resultado de 'term' também é resultado de 'broader_term'
+    (cada palavra do termo mais amplo é prefixo de alguma palavra do novo termo).
+    Ex.: 'camisa az' estreita 'cami'.
+    """
+    words = tokenize(term)
+    return bool(words) and all(
+        any(word.startswith(broad) for word in words) for broad in tokenize(broader_term)
+    )
+
+
+def rank_products(term, products):
+    """
+    Filtra e ordena localmente linhas de produto ({'id', 'sku', 'nome', ...}),
+    com as mesmas regras da busca no índice.
+    """
+    words = tokenize(term)
+    if not words:
+        return []
+    term_norm = normalize(term).strip()
+
+    scored = []
+    for product in products:
+        sku_norm = normalize(product['sku']).strip()
+        tokens = (sku_norm,) + tuple(tokenize(product['sku'])) + tuple(tokenize(product['nome']))
+        score = _score(words, term_norm, sku_norm, tokens)
+        if score is not None:
+            scored.append((-score, len(set(tokens)), product['id'], product))
+    scored.sort(key=lambda item: item[:3])
+    return [product for *_, product in scored]
+
+
+class ProductSearchIndex:
+    """
+    Índice invertido em memória para a busca de produtos por SKU ou nome.
+
+    Cada palavra do SKU e do nome (sem acentos) aponta para os ids dos produtos.
+    Uma busca casa cada palavra do termo como prefixo de alguma palavra indexada
+    (bisect numa lista ordenada), intersecta os conjuntos e ordena por relevância:
+    SKU exato > SKU começando com o termo > palavras inteiras > prefixos.
+    """
+
+    def __init__(self):
+        self._docs = {}       # id -> (sku normalizado, tokens do SKU + nome)
+        self._postings = {}   # token -> set de ids
+        self._sorted_tokens = []
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, product_id, sku, nome):
+        """Indexa (ou reindexa) um produto."""
+        sku_norm = normalize(sku).strip()
+        tokens = tuple(dict.fromkeys([sku_norm] + tokenize(sku) + tokenize(nome)))
+
+        with self._lock:
+            if product_id in self._docs:
+                self._unlink(product_id)
+            self._docs[product_id] = (sku_norm, tokens)
+            for token in tokens:
+                ids = self._postings.get(token)
+                if ids is None:
+                    self._postings[token] = ids = set()
+                    self._dirty = True
+                ids.add(product_id)
+
+    def remove(self, product_id):
+        with self._lock:
+            if product_id in self._docs:
+                self._unlink(product_id)
+                del self._docs[product_id]
+
+    def clear(self):
+        with self._lock:
+            self._docs.clear()
+            self._postings.clear()
+            self._sorted_tokens = []
+            self._dirty = False
+
+    def _unlink(self, product_id):
+        for token in self._docs[product_id][1]:
+            ids = self._postings.get(token)
+            if ids is not None:
+                ids.discard(product_id)
+                if not ids:
+                    del self._postings[token]
+                    self._dirty = True
+
+    def _prefix_matches(self, prefix):
+        """Ids de todos os produtos com alguma palavra começando por 'prefix'."""
+        if self._dirty:
+            self._sorted_tokens = sorted(self._postings)
+            self._dirty = False
+
+        tokens = self._sorted_tokens
+        position = bisect.bisect_left(tokens, prefix)
+        matched = set()
+        while position < len(tokens) and tokens[position].startswith(prefix):
+            matched |= self._postings[tokens[position]]
+            position += 1
+        return matched
+
+    def search(self, term, limit=None):
+        """Retorna os ids que casam com o termo, do mais para o menos relevante."""
+        words = tokenize(term)
+        if not words:
+            return []
+        term_norm = normalize(term).strip()
+
+        with self._lock:
+            candidates = None
+            # Começa pelas palavras mais longas: tendem a casar menos produtos
+            for word in sorted(words, key=len, reverse=True):
+                matched = self._prefix_matches(word)
+                candidates = matched if candidates is None else candidates & matched
+                if not candidates:
+                    return []
+
+            scored = []
+            for product_id in candidates:
+                sku_norm, tokens = self._docs[product_id]
+                score = _score(words, term_norm, sku_norm, tokens)
+                scored.append((-score, len(tokens), product_id))
+
+        scored.sort()
+        ids = [product_id for _, _, product_id in scored]
+        return ids[:limit] if limit else ids
@@ -0,0 +1,235 @@
+"""
+Ciclo de vida do access_token da loja na Shopee (OAuth da API v2).
+
+O token vale ~4h e o refresh_token ~30 dias (e é trocado a cada renovação). O TokenManager
+guarda os dois em memória e em disco (config.SHOPEE_TOKEN_FILE, compartilhado entre a GUI e
+o cli.py daemon) e renova em segundo plano antes de vencer, então quem pede o token nunca
+espera pela ida à Shopee, a não ser que não exista nenhum token válido.
+Só uma renovação roda por vez: no processo (lock) e entre processos (lock de arquivo,
+relendo o disco antes de renovar, porque outro processo pode ter acabado de trocar o
+refresh_token).
+"""
+import json
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+import config
+from file_utils import atomic_write, file_lock
+from shopee_signing import ShopeeSigner
+
+TOKEN_GET_PATH = "/api/v2/auth/token/get"
+TOKEN_REFRESH_PATH = "/api/v2/auth/access_token/get"
+RETRY_INTERVAL = 30  # segundos entre tentativas quando a renovação falha
+
+
+class ShopeeAuthError(Exception):
+    """Não há token válido e não foi possível obter um novo."""
+
+
+class TokenManager:
+    def __init__(self, signer=None, session=None, cache_path=None, refresh_margin=None):
+        self.partner_id = config.SHOPEE_PARTNER_ID
+        self.shop_id = config.SHOPEE_SHOP_ID
+        self.signer = signer or ShopeeSigner(self.partner_id, config.SHOPEE_PARTNER_KEY,
+                                             self.shop_id, config.SHOPEE_URL)
+        self.session = session or requests.Session()
+        self.path = Path(cache_path or config.SHOPEE_TOKEN_FILE)
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self.refresh_margin = config.SHOPEE_TOKEN_REFRESH_MARGIN if refresh_margin is None else refresh_margin
+
+        self._token = None  # {"access_token", "refresh_token", "expires_at", "shop_id"}
+        self._cond = threading.Condition()
+        self._refreshing = False
+        self._last_error = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._refresher = None
+        self.refreshes = 0
+
+    # ---------------------------- API ---------------------------- #
+    def get_token(self):
+        """
+        access_token válido. Dentro da margem de renovação devolve o atual e só agenda a
+        renovação; bloqueia (uma vez, para todas as threads) apenas se não houver token válido.
+        """
+        token = self._token
+        if token is None:
+            token = self._token = self._read_disk()
+        self._ensure_refresher()
+
+        now = time.time()
+        if token and now < token["expires_at"]:
+            if now >= token["expires_at"] - self.refresh_margin:
+                self._wake.set()  # Renovação antecipada no fundo; segue com o token atual
+            return token["access_token"]
+        return self._refresh_blocking()
+
+    def authorize(self, code):
+        """Troca o 'code' da tela de autorização da loja pelo primeiro par de tokens."""
+        response = self._call(TOKEN_GET_PATH, {"code": code})
+        try:
+            with file_lock(self.lock_path):
+                self._store(response)
+        except OSError as exc:
+            raise ShopeeAuthError(f"não foi possível gravar {self.path}: {exc}") from exc
+        return self._token
+
+    def status(self):
+        """Estado para exibir (CLI): validade do token, renovações feitas e último erro."""
+        token = self._token or self._read_disk()
+        return {
+            "has_token": token is not None,
+            "expires_in": int(token["expires_at"] - time.time()) if token else None,
+            "refreshes": self.refreshes,
+            "last_error": self._last_error,
+        }
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    # ---------------------------- RENOVAÇÃO ---------------------------- #
+    def _ensure_refresher(self):
+        if self._refresher is not None or self._stop.is_set():
+            return
+        with self._cond:
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._run_refresher,
+                                                   name="shopee-token-refresh", daemon=True)
+                self._refresher.start()
+
+    def _run_refresher(self):
+        """Dorme até a margem de renovação do token atual (ou até ser acordada) e renova."""
+        while not self._stop.is_set():
+            token = self._token
+            if token is None:
+                wait = RETRY_INTERVAL
+            else:
+                wait = token["expires_at"] - self.refresh_margin - time.time()
+                if self._last_error:
+                    wait = max(wait, RETRY_INTERVAL)
+            if wait > 0:
+                self._wake.wait(wait)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            token = self._token
+            if token is None or time.time() >= token["expires_at"] - self.refresh_margin:
+                self._refresh_once()
+
+    def _refresh_blocking(self):
+        """Sem token válido: espera a renovação em andamento ou faz uma."""
+        with self._cond:
+            while self._refreshing:
+                self._cond.wait()
+            token = self._token
+            if token and time.time() < token["expires_at"]:
+                return token["access_token"]
+        self._refresh_once()
+        token = self._token
+        if token and time.time() < token["expires_at"]:
+            return token["access_token"]
+        raise ShopeeAuthError(self._last_error or "sem access_token da Shopee")
+
+    def _refresh_once(self):
+        """Uma renovação por vez: quem chega durante outra espera por ela em vez de repetir."""
+        with self._cond:
+            if self._refreshing:
+                while self._refreshing:
+                    self._cond.wait()
+                return
+            self._refreshing = True
+        try:
+            with file_lock(self.lock_path):
+                disk = self._read_disk()
+                # Outro processo já renovou: só adota o token do disco
+                if disk and time.time() < disk["expires_at"] - self.refresh_margin:
+                    self._token = disk
+                    self._last_error = None
+                    return
+                current = disk or self._token or {}
+                refresh_token = current.get("refresh_token") or config.SHOPEE_REFRESH_TOKEN
+                if not refresh_token:
+                    raise ShopeeAuthError("sem refresh_token; autorize a loja com 'cli.py shopee-auth --code ...'")
+                self._store(self._call(TOKEN_REFRESH_PATH, {"refresh_token": refresh_token}))
+                self.refreshes += 1
+                self._last_error = None
+        except (ShopeeAuthError, OSError) as exc:
+            self._last_error = str(exc)
+            print(f"Erro ao renovar o token da Shopee: {exc}")
+        finally:
+            with self._cond:
+                self._refreshing = False
+                self._cond.notify_all()
+
+    # ---------------------------- HTTP / DISCO ---------------------------- #
+    def _call(self, path, fields):
+        """POST num endpoint de autenticação (assinatura sem access_token nem shop_id)."""
+        if not (self.partner_id and self.shop_id and config.SHOPEE_URL):
+            raise ShopeeAuthError("SHOPEE_PARTNER_ID, SHOPEE_SHOP_ID e SHOPEE_URL são obrigatórios")
+        try:
+            body = dict(fields, partner_id=int(self.partner_id), shop_id=int(self.shop_id))
+        except ValueError:
+            raise ShopeeAuthError("SHOPEE_PARTNER_ID e SHOPEE_SHOP_ID devem ser numéricos") from None
+        url, data = self.signer.prepare(path, payload=body, shop_level=False)
+        try:
+            response = self.session.post(url, data=data, timeout=config.SHOPEE_TIMEOUT,
+                                         headers={"Content-Type": "application/json"})
+        except requests.RequestException as exc:
+            raise ShopeeAuthError(f"{path}: falha de rede ({exc})") from exc
+        try:
+            resultado = response.json()
+        except ValueError:
+            raise ShopeeAuthError(f"{path}: resposta não é JSON (HTTP {response.status_code})") from None
+        if not isinstance(resultado, dict):
+            raise ShopeeAuthError(f"{path}: resposta inesperada (HTTP {response.status_code})")
+        if resultado.get("error"):
+            raise ShopeeAuthError(f"{path}: {resultado['error']} {resultado.get('message', '')}".strip())
+        for field in ("access_token", "refresh_token"):
+            if not isinstance(resultado.get(field), str) or not resultado[field]:
+                raise ShopeeAuthError(f"{path}: resposta sem {field} válido")
+        expire_in = resultado.get("expire_in")
+        if isinstance(expire_in, bool) or not isinstance(expire_in, (int, float)) or expire_in <= 0:
+            raise ShopeeAuthError(f"{path}: expire_in inválido na resposta ({expire_in!r})")
+        return resultado
+
+    def _store(self, response):
+        """
+        Guarda a resposta da Shopee em memória e em disco (chamar com o lock de arquivo).
+        'response' já foi validada por _call.
+        """
+        token = {
+            "shop_id": str(self.shop_id),
+            "access_token": response["access_token"],
+            "refresh_token": response["refresh_token"],
+            "expires_at": time.time() + response["expire_in"],
+        }
+        atomic_write(self.path, lambda handle: json.dump(token, handle), private=True)
+        self._token = token
+
+    def _read_disk(self):
+        try:
+            token = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not isinstance(token, dict) or str(token.get("shop_id")) != str(self.shop_id):
+            return None  # Arquivo de outra loja
+        if not token.get("access_token") or not isinstance(token.get("expires_at"), (int, float)):
+            return None  # Arquivo incompleto: trata como sem token
+        return token
+
+
+_shared_manager = None
+_shared_manager_lock = threading.Lock()
+
+
+def get_shared_token_manager():
+    """Gerenciador único do processo: todos os clientes/threads dividem o mesmo token."""
+    global _shared_manager
+    with _shared_manager_lock:
+        if _shared_manager is None:
+            _shared_manager = TokenManager()
+        return _shared_manager
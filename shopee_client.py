@@ -1,85 +1,253 @@
-import hmac
-import hashlib
+import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
-import json
+from requests.adapters import HTTPAdapter
 import config  # Nossas configurações
+from rate_limit import RateLimiter, parse_rates
+from shopee_auth import ShopeeAuthError, get_shared_token_manager
+from shopee_signing import ShopeeSigner, encode_body, print_debug
+
+STOCK_LIST_LIMIT = 50  # Máximo de modelos no stock_list de uma chamada de update_stock
+ITEM_INFO_LIMIT = 50  # Máximo de item_id por chamada de get_item_base_info
+ITEM_LIST_PAGE_SIZE = 100
+ORDER_LIST_PAGE_SIZE = 100
+ORDER_DETAIL_LIMIT = 50  # Máximo de order_sn por chamada de get_order_detail
+ORDER_WINDOW_MAX = 15 * 24 * 3600  # get_order_list aceita janelas de no máximo 15 dias
+
+
+class ShopeeAPIError(Exception):
+    """Consulta à API falhou (depois das retentativas); a leitura ficou incompleta."""
+
+
+class StockUpdateBatch:
+    """
+    Acumula atualizações de estoque por item e modelo antes de enviar.
+    Se o mesmo (item_id, model_id) for adicionado várias vezes, vale o último valor,
+    e todos os modelos de um item saem juntos no mesmo payload.
+    """
 
-class ShopeeClient:
     def __init__(self):
+        self._items = {}  # item_id -> {model_id: estoque}
+
+    def add(self, item_id, stock, model_id=0):
+        self._items.setdefault(int(item_id), {})[int(model_id)] = int(stock)
+
+    def items(self):
+        """Pares (item_id, [(model_id, estoque), ...])."""
+        return [(item_id, list(models.items())) for item_id, models in self._items.items()]
+
+    def clear(self):
+        self._items.clear()
+
+    def __len__(self):
+        return sum(len(models) for models in self._items.values())
+
+
+# Respostas que indicam excesso de requisições / falha temporária do servidor
+RETRY_STATUS = {429, 500, 502, 503, 504}
+THROTTLE_ERRORS = ("error_too_many_request", "too_many_request", "rate_limit")
+
+_shared_limiter = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_shared_rate_limiter():
+    """Limitador único do processo: todas as instâncias do cliente dividem a mesma cota."""
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter(config.SHOPEE_QPS, parse_rates(config.SHOPEE_QPS_PER_PATH))
+        return _shared_limiter
+
+
+class ShopeeClient:
+    def __init__(self, pool_size=None, rate_limiter=None, debug_hook=None, token_manager=None):
         # Carrega dados do config.py
         self.partner_id = config.SHOPEE_PARTNER_ID
         self.partner_key = config.SHOPEE_PARTNER_KEY
         self.shop_id = config.SHOPEE_SHOP_ID
         self.host = config.SHOPEE_URL
+        self.timeout = config.SHOPEE_TIMEOUT
+        self.simulate = config.SHOPEE_SIMULATE
+        # Chave HMAC preparada uma vez; cada requisição só copia o contexto
+        self.signer = ShopeeSigner(self.partner_id, self.partner_key, self.shop_id, self.host)
+        # debug_hook(evento, path, detalhes) recebe URL e corpo de cada envio; sem gancho
+        # (padrão, a menos que SHOPEE_DEBUG=1) nada de log é montado no caminho quente
+        self.debug_hook = debug_hook or (print_debug if config.SHOPEE_DEBUG else None)
+
+        # Uma única sessão HTTP (keep-alive) compartilhada por todas as threads de envio
+        pool_size = pool_size or config.SHOPEE_SYNC_WORKERS
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        self.rate_limiter = rate_limiter or get_shared_rate_limiter()
+        self.max_retries = config.SHOPEE_MAX_RETRIES
+        self._token_manager = token_manager
+
+    @property
+    def token_manager(self):
+        # Criado só no primeiro uso: no modo simulado nenhum token é pedido
+        if self._token_manager is None:
+            self._token_manager = get_shared_token_manager()
+        return self._token_manager
+
+    def _access_token(self):
+        """Token da loja em cache (renovado em segundo plano). Lança ShopeeAuthError se não houver."""
+        return self.token_manager.get_token()
 
-    def _generate_signature(self, path, timestamp, access_token=None):
+    def _post(self, path, payload, access_token):
+        return self._request("POST", path, access_token, payload=payload)
+
+    def _get(self, path, params, access_token):
+        """GET com os parâmetros do endpoint na query string (listas viram '1,2,3')."""
+        return self._request("GET", path, access_token, params=params)
+
+    def _request(self, method, path, access_token, payload=None, params=None):
         """
-        Cria a assinatura HMAC-SHA256 obrigatória.
-        Fórmula V2: hmac(partner_id + path + timestamp + [access_token] + [shop_id], partner_key)
+        Assina e envia uma requisição para a API usando a sessão compartilhada.
+        Respeita o limite de requisições do path e, em caso de recusa por excesso (429)
+        ou erro 5xx/de rede, tenta de novo com backoff exponencial + jitter,
+        honrando o Retry-After quando o servidor informa.
         """
-        # Converte tudo para string antes de concatenar
-        base_string = f"{self.partner_id}{path}{timestamp}"
-        
-        # Se tiver access_token (necessário para operações na loja), adiciona
-        if access_token:
-            base_string += access_token
-        
-        # Adiciona o shop_id
-        base_string += str(self.shop_id)
-
-        # Gera o Hash usando a chave secreta
-        signature = hmac.new(
-            self.partner_key.encode('utf-8'),
-            base_string.encode('utf-8'),
-            hashlib.sha256
-        ).hexdigest()
-        
-        return signature
+        attempt = 0
+        body = encode_body(payload)  # JSON compacto, serializado uma vez para todas as tentativas
+        while True:
+            self.rate_limiter.acquire(path)
+            # Timestamp e assinatura novos a cada tentativa (a API recusa timestamps velhos)
+            timestamp = int(time.time())
+            sign = self.signer.sign(path, timestamp, access_token)
+            url = self.signer.url(path, timestamp, sign, access_token, params)
+
+            if self.debug_hook is not None:
+                self.debug_hook("Enviando", path, {"url": url, "body": body, "attempt": attempt})
+
+            retry_after = None
+            try:
+                response = self.session.request(method, url, data=body, timeout=self.timeout)
+            except requests.RequestException as e:
+                throttled = False
+                error = str(e)
+            else:
+                # Status e Retry-After antes do corpo: 429/5xx de gateway costumam vir em HTML ou vazios
+                retry_after = self._parse_retry_after(response.headers.get("Retry-After"))
+                try:
+                    resultado = response.json()
+                except ValueError:
+                    resultado = None
+                if not isinstance(resultado, dict):
+                    resultado = None
+                api_error = str(resultado.get("error", "")) if resultado else ""
+                throttled = (response.status_code == 429 or
+                             any(code in api_error for code in THROTTLE_ERRORS))
+                if resultado is not None and not throttled and response.status_code not in RETRY_STATUS:
+                    self.rate_limiter.succeeded(path)
+                    return resultado
+                error = api_error or f"HTTP {response.status_code}"
+                if resultado is None:
+                    error += " (resposta não é JSON)"
+
+            if attempt >= self.max_retries:
+                return {"error": error}
+
+            delay = self._backoff_delay(attempt, retry_after)
+            if throttled:
+                self.rate_limiter.throttled(path, delay)
+            self.rate_limiter.record_retry()
+            if self.debug_hook is not None:
+                self.debug_hook("Nova tentativa", path, {"error": error, "delay": round(delay, 1),
+                                                         "attempt": attempt})
+            time.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _parse_retry_after(value):
+        try:
+            return max(0.0, float(value))
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _backoff_delay(attempt, retry_after=None):
+        """Backoff exponencial com jitter (entre metade e o teto); o Retry-After do servidor tem prioridade."""
+        if retry_after is not None:
+            return retry_after
+        ceiling = min(config.SHOPEE_BACKOFF_MAX, config.SHOPEE_BACKOFF_BASE * (2 ** attempt))
+        return random.uniform(ceiling / 2, ceiling)
+
+    def rate_limit_stats(self):
+        """Fila de espera, recusas (throttles) e taxa atual por endpoint."""
+        return self.rate_limiter.stats()
 
     def update_stock(self, shopee_item_id, new_quantity):
         """
         Envia a atualização de estoque para a Shopee.
         """
+        # Use model_id 0 se o produto não tiver variações (cor/tamanho)
+        return self.update_stock_models(shopee_item_id, [(0, new_quantity)])
+
+    def update_stock_models(self, shopee_item_id, stock_list):
+        """
+        Atualiza o estoque de vários modelos (variações) de um item.
+        'stock_list' é uma lista de (model_id, quantidade); todos os modelos vão no mesmo
+        payload, em chamadas de até STOCK_LIST_LIMIT modelos cada.
+        """
+        models = list(dict((int(m), int(q)) for m, q in stock_list).items())
+        responses = [
+            self._send_stock_list(shopee_item_id, models[start:start + STOCK_LIST_LIMIT])
+            for start in range(0, len(models), STOCK_LIST_LIMIT)
+        ]
+
+        if len(responses) == 1:
+            return responses[0]
+        errors = [r["error"] for r in responses if r.get("error")]
+        return {
+            "error": "; ".join(errors),
+            "msg": f"{len(models)} modelos enviados em {len(responses)} chamadas",
+            "responses": responses
+        }
+
+    def update_stock_batch(self, batch):
+        """Envia um StockUpdateBatch, uma chamada por item. Retorna {item_id: resposta}."""
+        return {item_id: self.update_stock_models(item_id, models)
+                for item_id, models in batch.items()}
+
+    def _send_stock_list(self, shopee_item_id, stock_list):
         path = "/api/v2/product/update_stock"
-        timestamp = int(time.time())
-        
-        # EM PRODUÇÃO: Você precisa implementar o fluxo OAuth para pegar este token real.
-        # Para testes locais sem app aprovado, usaremos um placeholder ou token de teste.
-        access_token = "seu_access_token_aqui" 
-
-        # Gera a assinatura para esta requisição específica
-        sign = self._generate_signature(path, timestamp, access_token)
-        
-        # Monta a URL completa
-        url = f"{self.host}{path}?partner_id={self.partner_id}&timestamp={timestamp}&sign={sign}&shop_id={self.shop_id}&access_token={access_token}"
-        
+
         # Monta o corpo da mensagem (JSON)
         payload = {
             "item_id": int(shopee_item_id),
             "stock_list": [
-                {
-                    "model_id": 0, # Use 0 se o produto não tiver variações (cor/tamanho)
-                    "stock": int(new_quantity)
-                }
+                {"model_id": model_id, "stock": stock}
+                for model_id, stock in stock_list
             ]
         }
 
-        print(f"--- [SHOPEE LOG] Enviando Update ---")
-        print(f"URL: {url}")
-        print(f"Payload: {json.dumps(payload, indent=2)}")
-
         # --- MODO DE SIMULAÇÃO (SEGURANÇA PARA DESENVOLVIMENTO) ---
         # Como provavelmente você ainda não tem um App Aprovado na Shopee ("Live"),
-        # a requisição real falharia. Vamos simular um sucesso para você montar a GUI.
-        
-        # Para PRODUÇÃO, descomente as linhas abaixo:
-        # try:
-        #     headers = {"Content-Type": "application/json"}
-        #     response = requests.post(url, json=payload, headers=headers, timeout=10)
-        #     return response.json()
-        # except Exception as e:
-        #     return {"error": str(e)}
+        # a requisição real falharia. Com SHOPEE_SIMULATE=1 (padrão) simulamos um sucesso.
+        # Para PRODUÇÃO, defina SHOPEE_SIMULATE=0 no .env.
+        if not self.simulate:
+            try:
+                access_token = self._access_token()
+            except ShopeeAuthError as exc:
+                return {"error": f"token: {exc}"}
+            resultado = self._post(path, payload, access_token)
+            # A API aceita parte dos modelos e lista os recusados em failure_list
+            failures = (resultado.get("response") or {}).get("failure_list") or []
+            if failures and not resultado.get("error"):
+                resultado["error"] = "; ".join(
+                    f"modelo {f.get('model_id')}: {f.get('failed_reason')}" for f in failures
+                )
+            return resultado
+
+        if self.debug_hook is not None:
+            self.debug_hook("Enviando Update (SIMULADO)", path, {"body": payload})
 
         # Retorno Simulado
         time.sleep(1) # Simula o tempo da internet
@@ -88,6 +256,128 @@ class ShopeeClient:
             "msg": "Update success (SIMULADO)",
             "response": {
                 "item_id": shopee_item_id,
-                "stock": new_quantity
+                "stock_list": payload["stock_list"]
             }
-        }
\ No newline at end of file
+        }
+    # ---------------------------- LEITURA (PULL) ---------------------------- #
+    def _query(self, path, params):
+        """GET de leitura: devolve o 'response' da API ou lança ShopeeAPIError."""
+        if self.simulate:
+            # Sem app aprovado não há o que ler: a loja simulada não tem itens nem pedidos
+            if self.debug_hook is not None:
+                self.debug_hook("Consulta (SIMULADO)", path, {"body": params})
+            return {}
+        try:
+            access_token = self._access_token()
+        except ShopeeAuthError as exc:
+            raise ShopeeAPIError(f"{path}: token: {exc}") from exc
+        resultado = self._get(path, params, access_token)
+        if resultado.get("error"):
+            raise ShopeeAPIError(f"{path}: {resultado['error']} {resultado.get('message', '')}".strip())
+        return resultado.get("response") or {}
+
+    def _map_concurrent(self, func, chunks):
+        """Aplica 'func' em cada pedaço em paralelo (a cota por path fica com o rate limiter)."""
+        chunks = list(chunks)
+        if len(chunks) <= 1:
+            return [func(chunk) for chunk in chunks]
+        workers = min(len(chunks), config.SHOPEE_SYNC_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shopee-pull") as executor:
+            return list(executor.map(func, chunks))
+
+    @staticmethod
+    def _chunks(values, size):
+        values = list(values)
+        return [values[start:start + size] for start in range(0, len(values), size)]
+
+    def get_item_list(self, update_time_from=None, update_time_to=None, item_status="NORMAL"):
+        """Ids de todos os anúncios (opcionalmente só os alterados na janela), página por página."""
+        item_ids, offset = [], 0
+        while True:
+            response = self._query("/api/v2/product/get_item_list", {
+                "offset": offset,
+                "page_size": ITEM_LIST_PAGE_SIZE,
+                "item_status": item_status,
+                "update_time_from": update_time_from,
+                "update_time_to": update_time_to,
+            })
+            item_ids.extend(item["item_id"] for item in response.get("item") or [])
+            if not response.get("has_next_page"):
+                return item_ids
+            offset = response["next_offset"]
+
+    def get_item_base_info(self, item_ids):
+        """Dados básicos (inclusive estoque) dos itens, em lotes de ITEM_INFO_LIMIT ids em paralelo."""
+        def fetch(chunk):
+            response = self._query("/api/v2/product/get_item_base_info", {"item_id_list": chunk})
+            return response.get("item_list") or []
+
+        pages = self._map_concurrent(fetch, self._chunks(item_ids, ITEM_INFO_LIMIT))
+        return [item for page in pages for item in page]
+
+    def get_model_list(self, item_id):
+        response = self._query("/api/v2/product/get_model_list", {"item_id": int(item_id)})
+        return response.get("model") or []
+
+    @staticmethod
+    def _available_stock(info):
+        """Estoque disponível de um item/modelo (stock_info_v2, com fallback para o formato antigo)."""
+        summary = (info.get("stock_info_v2") or {}).get("summary_info") or {}
+        if "total_available_stock" in summary:
+            return int(summary["total_available_stock"])
+        stock_info = info.get("stock_info") or []
+        return sum(int(entry.get("normal_stock", entry.get("current_stock", 0))) for entry in stock_info)
+
+    def get_item_stock(self, item_ids):
+        """
+        Estoque atual na Shopee: {item_id: {model_id: estoque}} (model_id 0 = item sem variação).
+        Uma chamada por lote de 50 itens e mais uma por item com variações, em paralelo.
+        """
+        stock, with_models = {}, []
+        for item in self.get_item_base_info(item_ids):
+            if item.get("has_model"):
+                with_models.append(item["item_id"])
+            else:
+                stock[item["item_id"]] = {0: self._available_stock(item)}
+
+        def fetch_models(item_id):
+            return item_id, {model["model_id"]: self._available_stock(model)
+                             for model in self.get_model_list(item_id)}
+
+        stock.update(self._map_concurrent(fetch_models, with_models))
+        return stock
+
+    def get_order_list(self, time_from, time_to, time_range_field="update_time", order_status=None):
+        """order_sn dos pedidos criados/alterados entre time_from e time_to (timestamps Unix)."""
+        order_sns = []
+        window_start = int(time_from)
+        while window_start < time_to:
+            window_end = min(int(time_to), window_start + ORDER_WINDOW_MAX)
+            cursor = ""
+            while True:
+                response = self._query("/api/v2/order/get_order_list", {
+                    "time_range_field": time_range_field,
+                    "time_from": window_start,
+                    "time_to": window_end,
+                    "page_size": ORDER_LIST_PAGE_SIZE,
+                    "cursor": cursor,
+                    "order_status": order_status,
+                })
+                order_sns.extend(order["order_sn"] for order in response.get("order_list") or [])
+                if not response.get("more"):
+                    break
+                cursor = response["next_cursor"]
+            window_start = window_end
+        return list(dict.fromkeys(order_sns))
+
+    def get_order_details(self, order_sns):
+        """Status e itens dos pedidos, em lotes de ORDER_DETAIL_LIMIT em paralelo."""
+        def fetch(chunk):
+            response = self._query("/api/v2/order/get_order_detail", {
+                "order_sn_list": chunk,
+                "response_optional_fields": "item_list",
+            })
+            return response.get("order_list") or []
+
+        pages = self._map_concurrent(fetch, self._chunks(order_sns, ORDER_DETAIL_LIMIT))
+        return [order for page in pages for order in page]
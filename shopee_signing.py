@@ -0,0 +1,100 @@
+"""
+Assinatura e montagem das requisições da API v2 da Shopee.
+
+A chave HMAC (partner_key) é preparada uma vez: o contexto com partner_id + path já
+somados fica guardado por path e cada requisição só faz copy() e soma o resto
+(timestamp, access_token, shop_id). URL e corpo são montados direto em string/bytes,
+sem dicionários intermediários nem JSON indentado.
+"""
+import hashlib
+import hmac
+import json
+import time
+from urllib.parse import urlencode
+
+_compact = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+
+
+def encode_body(payload):
+    """Corpo JSON compacto em UTF-8 (None = sem corpo)."""
+    if payload is None:
+        return None
+    return _compact.encode(payload).encode("utf-8")
+
+
+def query_value(value):
+    """Listas viram '1,2,3' (formato que a API espera para ids)."""
+    if isinstance(value, (list, tuple)):
+        return ",".join(str(v) for v in value)
+    return value
+
+
+class ShopeeSigner:
+    """
+    Fórmula V2: hmac_sha256(partner_key, partner_id + path + timestamp + [access_token] + [shop_id]).
+    Pode ser compartilhado entre threads (os contextos guardados só são copiados, nunca alterados).
+    """
+
+    def __init__(self, partner_id, partner_key, shop_id=None, host=""):
+        self.partner_id = str(partner_id or "")
+        self.shop_id = str(shop_id) if shop_id else ""
+        self.host = host or ""
+        self._base = hmac.new((partner_key or "").encode("utf-8"), self.partner_id.encode("utf-8"),
+                              hashlib.sha256)
+        self._path_macs = {}  # path -> contexto HMAC com partner_id + path já somados
+        self._url_prefixes = {}  # path -> "host/path?partner_id=..&timestamp="
+
+    def _path_mac(self, path):
+        mac = self._path_macs.get(path)
+        if mac is None:
+            mac = self._base.copy()
+            mac.update(path.encode("utf-8"))
+            self._path_macs[path] = mac
+        return mac
+
+    def sign(self, path, timestamp, access_token=None, shop_level=True):
+        """shop_level=False assina só partner_id + path + timestamp (endpoints públicos/auth)."""
+        mac = self._path_mac(path).copy()
+        tail = str(timestamp)
+        if access_token:
+            tail += access_token
+        if shop_level:
+            tail += self.shop_id
+        mac.update(tail.encode("utf-8"))
+        return mac.hexdigest()
+
+    def url(self, path, timestamp, sign, access_token=None, params=None, shop_level=True):
+        prefix = self._url_prefixes.get(path)
+        if prefix is None:
+            prefix = self._url_prefixes[path] = f"{self.host}{path}?partner_id={self.partner_id}&timestamp="
+        parts = [prefix, str(timestamp), "&sign=", sign]
+        if shop_level:
+            parts += ["&shop_id=", self.shop_id]
+        if access_token:
+            parts += ["&access_token=", access_token]
+        if params:
+            query = urlencode([(key, query_value(value)) for key, value in params.items()
+                               if value is not None])
+            if query:
+                parts += ["&", query]
+        return "".join(parts)
+
+    def prepare(self, path, access_token=None, payload=None, params=None, shop_level=True, timestamp=None):
+        """(url assinada, corpo em bytes ou None) prontos para enviar."""
+        timestamp = int(time.time()) if timestamp is None else timestamp
+        sign = self.sign(path, timestamp, access_token, shop_level)
+        return self.url(path, timestamp, sign, access_token, params, shop_level), encode_body(payload)
+
+
+def print_debug(event, path, details):
+    """Gancho de depuração que reproduz o log detalhado antigo (SHOPEE_DEBUG=1)."""
+    print(f"--- [SHOPEE LOG] {event} {path} ---")
+    if "error" in details:
+        print(f"Falhou: {details['error']}; nova tentativa em {details.get('delay')}s")
+    if "url" in details:
+        print(f"URL: {details['url']}")
+    body = details.get("body")
+    if body is not None:
+        if isinstance(body, bytes):
+            body = json.loads(body)
+        print(f"Payload: {json.dumps(body, indent=2, ensure_ascii=False)}")
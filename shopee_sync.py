@@ -0,0 +1,88 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import config
+from shopee_client import ShopeeClient, StockUpdateBatch
+
+
+class SyncReport:
+    """Resultado agregado de um envio em lote para a Shopee."""
+
+    def __init__(self):
+        self.succeeded = []  # item_ids aceitos pela API
+        self.failed = {}     # item_id -> mensagem de erro
+        self.elapsed = 0.0
+
+    @property
+    def total(self):
+        return len(self.succeeded) + len(self.failed)
+
+    def summary(self):
+        return (f"{len(self.succeeded)} enviados, {len(self.failed)} com erro "
+                f"em {self.elapsed:.1f}s")
+
+
+class ShopeeSyncEngine:
+    """
+    Envia muitas atualizações de estoque ao mesmo tempo através de um pool de threads
+    de tamanho fixo. Todas as threads usam a mesma sessão HTTP (keep-alive) do
+    ShopeeClient, e cada requisição tem o timeout configurado no cliente.
+    """
+
+    def __init__(self, client=None, max_workers=None):
+        self.max_workers = max_workers or config.SHOPEE_SYNC_WORKERS
+        self.client = client or ShopeeClient(pool_size=self.max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix="shopee-sync")
+        # Limita quantos envios ficam na fila do executor de uma vez
+        self._slots = threading.BoundedSemaphore(self.max_workers * 2)
+
+    def push_stock(self, updates, on_result=None):
+        """
+        Envia atualizações em paralelo e espera todas terminarem.
+        'updates' aceita (item_id, quantidade) ou (item_id, model_id, quantidade).
+        Os modelos de um mesmo item vão juntos numa chamada e, se o mesmo modelo
+        aparecer mais de uma vez, só a última quantidade é enviada.
+        'on_result(item_id, resposta)' é chamado (na thread de envio) a cada resposta.
+        """
+        batch = StockUpdateBatch()
+        for update in updates:
+            if len(update) == 3:
+                item_id, model_id, qty = update
+            else:
+                (item_id, qty), model_id = update, 0
+            batch.add(item_id, qty, model_id)
+
+        report = SyncReport()
+        lock = threading.Lock()
+        started = time.monotonic()
+
+        futures = []
+        for item_id, models in batch.items():
+            self._slots.acquire()
+            futures.append(self._executor.submit(self._send, report, lock, item_id, models, on_result))
+
+        wait(futures)
+        report.elapsed = time.monotonic() - started
+        return report
+
+    def _send(self, report, lock, item_id, models, on_result):
+        try:
+            result = self.client.update_stock_models(item_id, models)
+        except Exception as exc:
+            result = {"error": str(exc)}
+        finally:
+            self._slots.release()
+
+        with lock:
+            if result.get("error"):
+                report.failed[item_id] = result["error"]
+            else:
+                report.succeeded.append(item_id)
+
+        if on_result:
+            on_result(item_id, result)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
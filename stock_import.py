@@ -0,0 +1,152 @@
+import csv
+import os
+import time
+
+import database
+from search_index import sku_key
+
+IMPORT_CHUNK_SIZE = 5000
+MAX_REJECTED_KEPT = 1000  # Linhas recusadas guardadas no relatório (as demais só são contadas)
+
+
+class ImportReport:
+    """Contadores e linhas recusadas de uma importação de estoque."""
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.read = 0
+        self.valid = 0
+        self.written = 0
+        self.rejected_count = 0
+        self.rejected = []  # (linha, sku, motivo)
+        self.elapsed = 0.0
+        self.progress = 0.0  # Fração do arquivo já lida (0 a 1)
+
+    def reject(self, line, sku, reason):
+        self.rejected_count += 1
+        if len(self.rejected) < MAX_REJECTED_KEPT:
+            self.rejected.append((line, sku, reason))
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        action = "validadas (simulação)" if self.dry_run else "gravadas"
+        return (f"{self.read} linhas lidas, {self.valid} válidas, {self.written} {action}, "
+                f"{self.rejected_count} recusadas em {self.elapsed:.1f}s "
+                f"({self.rows_per_second:,.0f} linhas/s)")
+
+
+def _iter_csv(path):
+    """Gera (nº da linha, sku, quantidade em texto, fração lida) sem carregar o arquivo."""
+    size = os.path.getsize(path) or 1
+    with open(path, newline="", encoding="utf-8-sig") as handle:
+        sample = handle.read(4096)
+        handle.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=";,\t")
+        except csv.Error:
+            dialect = csv.excel
+        for line, row in enumerate(csv.reader(handle, dialect), start=1):
+            if len(row) < 2:
+                continue
+            yield line, row[0], row[1], handle.buffer.tell() / size
+
+
+def _iter_xlsx(path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError("Para importar .xlsx instale o openpyxl (pip install openpyxl).")
+
+    # read_only lê a planilha em fluxo, sem montar todas as células na memória
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        total = sheet.max_row or 1
+        for line, row in enumerate(sheet.iter_rows(max_col=2, values_only=True), start=1):
+            if row[0] is None:
+                continue
+            yield line, str(row[0]), "" if row[1] is None else str(row[1]), line / total
+    finally:
+        workbook.close()
+
+
+def iter_stock_rows(path):
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        return _iter_xlsx(path)
+    return _iter_csv(path)
+
+
+def _parse_quantity(raw):
+    raw = raw.strip()
+    if raw.endswith(".0"):  # Planilhas costumam devolver inteiros como float
+        raw = raw[:-2]
+    if not raw.isdigit():
+        return None
+    return int(raw)
+
+
+def import_stock_file(path, dry_run=False, chunk_size=IMPORT_CHUNK_SIZE,
+                      on_progress=None, known_skus=None):
+    """
+    Importa um arquivo de estoque (CSV 'sku;quantidade' ou XLSX com as duas primeiras colunas).
+
+    - Lê o arquivo em fluxo: a memória não cresce com o número de linhas.
+    - Valida cada linha contra o conjunto de SKUs do banco, carregado uma vez.
+    - Grava em lotes de 'chunk_size' via database.update_stock_bulk (uma transação por lote),
+      o que também coloca os anúncios Shopee afetados na sync_outbox.
+    - dry_run=True só valida e conta, sem gravar.
+    - 'on_progress(report)' é chamado a cada lote.
+    Retorna um ImportReport (ou None se o banco falhar no meio; lotes anteriores ficam gravados).
+    """
+    started = time.monotonic()
+    report = ImportReport(dry_run)
+    if known_skus is None:
+        known_skus = database.get_all_skus()
+    # Compara como a collation da coluna (maiúsculas, acentos)
+    known_skus = {sku_key(sku) for sku in known_skus}
+
+    chunk = []
+
+    def flush():
+        if dry_run:
+            report.written += len(chunk)
+        else:
+            resultado = database.update_stock_bulk(chunk)
+            if resultado is None:
+                return False
+            report.written += len(resultado["encontrados"])
+        report.elapsed = time.monotonic() - started
+        if on_progress:
+            on_progress(report)
+        chunk.clear()
+        return True
+
+    for line, sku, raw_qty, progress in iter_stock_rows(path):
+        sku = sku.strip()
+        qty = _parse_quantity(raw_qty)
+        if qty is None:
+            if line > 1:  # A primeira linha normalmente é o cabeçalho
+                report.read += 1
+                report.reject(line, sku, f"quantidade inválida: {raw_qty!r}")
+            continue
+
+        report.read += 1
+        report.progress = progress
+        if sku_key(sku) not in known_skus:
+            report.reject(line, sku, "SKU não cadastrado")
+            continue
+
+        report.valid += 1
+        chunk.append((sku, qty))
+        if len(chunk) >= chunk_size and not flush():
+            return None
+
+    if chunk and not flush():
+        return None
+
+    report.progress = 1.0
+    report.elapsed = time.monotonic() - started
+    return report
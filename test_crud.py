@@ -1,3 +1,5 @@
+import time
+import tracemalloc
 import database
 
 def rodar_testes():
@@ -30,5 +32,62 @@ def rodar_testes():
         
         print(f"{marcador}{p['sku']} | Estoque: {p['estoque_real']}")
 
+    print("\n--- 5. TESTE DE ATUALIZAÇÃO EM LOTE (BULK UPDATE) ---")
+    lote = [("TENIS-X", 50), ("BONE-VERMELHO", 100), ("SKU-INEXISTENTE", 1)]
+    resultado = database.update_stock_bulk(lote)
+    if resultado is None:
+        print("❌ Falha na transação em lote.")
+    else:
+        print(f"✅ Atualizados: {resultado['encontrados']}")
+        print(f"⚠️  Não encontrados: {resultado['nao_encontrados']}")
+
+    print("\n--- 6. TESTE DE CADASTRO EM LOTE (BULK CREATE) ---")
+    novos = [
+        {"sku": "MEIA-BRANCA", "nome": "Meia Branca Cano Alto", "preco": 12.50, "estoque": 300},
+        {"sku": "MEIA-PRETA", "nome": "Meia Preta Cano Alto", "preco": 12.50, "estoque": 250,
+         "shopee_id": 123456789},
+        {"sku": "", "nome": "Sem SKU", "preco": 1, "estoque": 1},
+        ("SKU-INCOMPLETO", "Linha sem preço e estoque"),
+        ("SKU-NAN", "Preço NaN", "nan", 1),
+    ]
+    resultado = database.add_products_bulk(novos)
+    print(f"🆕 Inseridos: {resultado['inseridos']}")
+    print(f"✏️  Atualizados: {resultado['atualizados']}")
+    print(f"⚠️  Rejeitados: {resultado['rejeitados']}")
+
+    print("\n--- 7. CATÁLOGO EM MEMÓRIA ---")
+    inicio = time.perf_counter()
+    database.get_all_products()
+    catalogo = database.get_catalog_stats()
+    print(f"Leitura do catálogo (cache): {(time.perf_counter() - inicio) * 1000:.2f} ms "
+          f"| {catalogo['products']} produtos | versão {catalogo['version']}")
+    produto = database.get_product_by_sku("meia-branca")
+    print(f"MEIA-BRANCA pelo SKU (sem diferenciar maiúsculas) logo após o cadastro: {'✅' if produto else '❌'}")
+
+    print("\n--- 8. LISTAGEM EM COLUNAS (ProductColumns) ---")
+    tracemalloc.start()
+    como_dicts = database.get_all_products()
+    memoria_dicts = tracemalloc.get_traced_memory()[0]
+    del como_dicts
+    tracemalloc.stop()
+    tracemalloc.start()
+    colunas = database.get_products_columns()
+    memoria_colunas = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{len(colunas)} produtos | dicts: {memoria_dicts / 1024:.0f} KiB | "
+          f"colunas: {memoria_colunas / 1024:.0f} KiB")
+    if len(colunas):
+        print(f"Primeira linha (visão dict): {dict(colunas[0])}")
+
+    print("\n--- 9. POOL DE CONEXÕES ---")
+    stats = database.get_pool_stats()
+    print(f"Conexões criadas: {stats['created']}/{stats['size']} | Em uso: {stats['in_use']} | "
+          f"Espera média: {stats['avg_wait_ms']:.2f} ms")
+
+    print("\n--- 10. MÉTRICAS DAS CHAMADAS AO BANCO ---")
+    for nome, m in sorted(database.get_metrics()["functions"].items()):
+        print(f"{nome:<26} {m['calls']:>3} chamadas | média {m['avg_ms']:.1f} ms | "
+              f"p95 {m['p95_ms']:.1f} ms | {m['rows']} linhas | espera {m['wait_ms']:.1f} ms")
+
 if __name__ == "__main__":
     rodar_testes()
\ No newline at end of file
@@ -1,4 +1,6 @@
-from shopee_client import ShopeeClient
+import time
+from shopee_client import ShopeeClient, StockUpdateBatch
+from shopee_sync import ShopeeSyncEngine
 
 def testar_integracao():
     print("--- TESTE DE CLIENTE SHOPEE ---")
@@ -23,5 +25,31 @@ def testar_integracao():
     else:
         print(f"✅ Sucesso! Resposta da API: {resultado['msg']}")
 
+    # 5. Várias variações (cor/tamanho) do mesmo item numa única chamada
+    print("\n--- VARIAÇÕES NUM ÚNICO PAYLOAD ---")
+    lote_modelos = StockUpdateBatch()
+    lote_modelos.add(id_produto_fake, 10, model_id=1)
+    lote_modelos.add(id_produto_fake, 20, model_id=2)
+    lote_modelos.add(id_produto_fake, 15, model_id=1)  # Substitui o 10 do modelo 1
+    respostas = client.update_stock_batch(lote_modelos)
+    print(f"{len(lote_modelos)} modelos -> {len(respostas)} chamada(s)")
+
+    # 6. Envio em lote: vários itens ao mesmo tempo pelo pool de threads
+    print("\n--- ENVIO EM LOTE (ENGINE) ---")
+    engine = ShopeeSyncEngine(client, max_workers=4)
+    lote = [(id_produto_fake + i, novo_estoque) for i in range(8)]
+    relatorio = engine.push_stock(lote)
+    engine.shutdown()
+    print(f"Resultado: {relatorio.summary()}")
+
+    # 7. Leitura em lote: estoque dos anúncios e pedidos recentes (sem chamada por SKU)
+    print("\n--- LEITURA EM LOTE (PULL) ---")
+    estoque_remoto = client.get_item_stock([id_produto_fake + i for i in range(120)])
+    print(f"Estoque lido de {len(estoque_remoto)} itens")
+    agora = int(time.time())
+    pedidos = client.get_order_list(agora - 3600, agora)
+    detalhes = client.get_order_details(pedidos)
+    print(f"{len(pedidos)} pedidos na última hora, {len(detalhes)} com detalhes")
+
 if __name__ == "__main__":
     testar_integracao()
\ No newline at end of file
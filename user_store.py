@@ -0,0 +1,152 @@
+import json
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import passwords
+from file_utils import atomic_write, file_lock
+
+
+class UserStore:
+    """
+    Armazena usuários com acesso limitado em um arquivo JSON local.
+
+    Os usuários ficam num índice em memória (nome em minúsculas -> usuário), então o login
+    é uma consulta O(1); o arquivo só é relido quando muda (mtime/tamanho/inode).
+    Escritas seguram um lock de arquivo (<arquivo>.lock), releem o estado atual do disco,
+    gravam num temporário e trocam com os.replace: outro processo nunca vê o arquivo pela
+    metade e duas gravações simultâneas não se perdem.
+    Senhas são gravadas como hash (passwords.py); entradas antigas em texto puro ou com
+    custo desatualizado são refeitas no primeiro login bem-sucedido.
+    """
+
+    def __init__(self, file_path="users.json", default_username=None, default_password=None):
+        self.path = Path(file_path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self.default_username = default_username
+        self.default_password = default_password
+
+        self._index = {}          # nome em minúsculas -> dict do usuário (ordem do arquivo)
+        self._signature = None    # (mtime_ns, tamanho, inode) do arquivo carregado
+        self._lock = threading.RLock()
+        self._ensure_storage()
+
+    def _ensure_storage(self):
+        with self._file_lock():
+            if self.path.exists():
+                return
+
+            initial_users = []
+            if self.default_username and self.default_password:
+                initial_users.append({
+                    "username": self.default_username,
+                    "password": passwords.hash_password(self.default_password),
+                    "role": "limited"
+                })
+
+            self._save_users(initial_users)
+
+    # ---------------------------- ARQUIVO ---------------------------- #
+    def _file_signature(self):
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _file_lock(self):
+        return file_lock(self.lock_path)
+
+    def _read_file(self):
+        """Lista de usuários do disco. Lança ValueError se o JSON estiver corrompido."""
+        if not self.path.exists():
+            return []
+        raw = self.path.read_text(encoding="utf-8")
+        return json.loads(raw) if raw else []
+
+    def _set_index(self, users, signature):
+        self._index = {user["username"].lower(): user for user in users}
+        self._signature = signature
+
+    def _refresh(self):
+        """Recarrega o índice se o arquivo mudou desde a última leitura."""
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        with self._lock:
+            if signature == self._signature:
+                return
+            try:
+                users = self._read_file()
+            except ValueError:
+                # Arquivo corrompido/editado pela metade: mantém o último índice bom
+                print(f"Aviso: {self.path} inválido; usando a última lista de usuários carregada.")
+                return
+            self._set_index(users, signature)
+
+    def _save_users(self, users):
+        atomic_write(self.path, lambda handle: json.dump(users, handle, indent=2))
+        self._set_index(users, self._file_signature())
+
+    @contextmanager
+    def _editing(self):
+        """Lista atual de usuários (relida do disco sob lock) para alterar e gravar."""
+        with self._lock, self._file_lock():
+            try:
+                users = self._read_file()
+            except ValueError:
+                users = list(self._index.values())
+            yield users
+
+    # ---------------------------- API ---------------------------- #
+    def list_users(self):
+        self._refresh()
+        return list(self._index.values())
+
+    def get_user(self, username):
+        self._refresh()
+        return self._index.get(username.strip().lower())
+
+    def validate_user(self, username, password):
+        """Confere a senha (custo do KDF: chame fora da thread da interface)."""
+        user = self.get_user(username)
+        if user is None or not passwords.verify_password(password, user["password"]):
+            return False
+        if passwords.needs_rehash(user["password"]):
+            self._rehash(user["username"], user["password"], password)
+        return True
+
+    def _rehash(self, username, old_stored, password):
+        new_stored = passwords.hash_password(password)
+        with self._editing() as users:
+            for user in users:
+                # Só troca se ninguém alterou a senha entre a leitura e agora
+                if user["username"].lower() == username.lower() and user["password"] == old_stored:
+                    user["password"] = new_stored
+                    self._save_users(users)
+                    break
+
+    def add_user(self, username, password):
+        username = username.strip()
+        if not username or not password:
+            return False, "Usuário e senha são obrigatórios."
+
+        stored = passwords.hash_password(password)  # fora do lock: o KDF é lento de propósito
+        with self._editing() as users:
+            if any(u["username"].lower() == username.lower() for u in users):
+                return False, "Usuário já existe."
+
+            users.append({"username": username, "password": stored, "role": "limited"})
+            self._save_users(users)
+        return True, "Usuário criado com sucesso."
+
+    def remove_user(self, username):
+        with self._editing() as users:
+            filtered = [u for u in users if u["username"].lower() != username.lower()]
+
+            if len(filtered) == len(users):
+                return False, "Usuário não encontrado."
+
+            self._save_users(filtered)
+        return True, "Usuário removido."
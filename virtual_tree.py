@@ -0,0 +1,206 @@
+from tkinter import ttk
+
+
+class VirtualTree:
+    """
+    Tabela virtualizada em cima de um ttk.Treeview.
+
+    O resultado completo fica numa lista de tuplas (backing store) e só as linhas
+    visíveis existem como itens no Treeview. Rolar apenas troca os valores desses
+    poucos itens, então o custo de exibir a tabela não depende do tamanho do catálogo.
+    Quando a rolagem chega perto do fim das linhas já carregadas (menos de
+    'buffer_rows' à frente), chama 'on_need_more' para buscar a próxima página.
+    """
+
+    def __init__(self, parent, columns, buffer_rows=100, on_select=None, on_need_more=None):
+        self.columns = tuple(columns)
+        self.buffer_rows = buffer_rows
+        self.on_select = on_select
+        self.on_need_more = on_need_more
+
+        self.rows = []
+        self.total = 0
+        self.offset = 0
+        self.visible_rows = 12
+        self.selected_index = None
+        self._loading_more = False
+        self._target_offset = None
+
+        self.tree = ttk.Treeview(parent, columns=self.columns, show="headings",
+                                 height=self.visible_rows, selectmode="browse")
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self._on_scrollbar)
+
+        self.tree.bind("<<TreeviewSelect>>", self._on_tree_select)
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda _: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda _: self.scroll(3))
+        self.tree.bind("<Up>", lambda _: self._move_selection(-1))
+        self.tree.bind("<Down>", lambda _: self._move_selection(1))
+        self.tree.bind("<Prior>", lambda _: self._move_selection(-self.visible_rows))
+        self.tree.bind("<Next>", lambda _: self._move_selection(self.visible_rows))
+
+    # ---------------------------- DADOS ---------------------------- #
+    def set_rows(self, rows, total=None):
+        """Substitui o conteúdo. 'total' > len(rows) indica que há mais páginas a carregar."""
+        # Sequências com extend() (ex.: ProductTableRows) são usadas sem cópia
+        self.rows = rows if hasattr(rows, "extend") else list(rows)
+        self.total = max(total or 0, len(self.rows))
+        self.offset = 0
+        self.selected_index = None
+        self._loading_more = False
+        self._target_offset = None
+        self._render()
+        # Recalcula quantas linhas cabem assim que os primeiros itens existirem
+        self.tree.after_idle(self._on_resize)
+
+    def append_rows(self, rows):
+        """Acrescenta uma página recebida de 'on_need_more'. Lista vazia encerra a paginação."""
+        self._loading_more = False
+        if rows:
+            self.rows.extend(rows)
+        else:
+            self.total = len(self.rows)
+        self.total = max(self.total, len(self.rows))
+
+        target, self._target_offset = self._target_offset, None
+        if target is not None:
+            self.offset = self._clamp_offset(target)
+        self._render()
+
+    def get_row(self, index):
+        return self.rows[index]
+
+    def update_row(self, index, **values):
+        """Altera colunas de uma linha (por nome) e redesenha se ela estiver visível."""
+        row = list(self.rows[index])
+        for column, value in values.items():
+            row[self.columns.index(column)] = value
+        self.rows[index] = tuple(row)
+
+        position = index - self.offset
+        if 0 <= position < len(self.tree.get_children()):
+            self.tree.item(self._iid(position), values=self.rows[index])
+
+    def clear_selection(self):
+        self.selected_index = None
+        if self.tree.selection():
+            self.tree.selection_remove(self.tree.selection())
+
+    # ---------------------------- ROLAGEM ---------------------------- #
+    def scroll(self, delta):
+        self._scroll_to(self.offset + delta)
+
+    def _scroll_to(self, offset):
+        offset = self._clamp_offset(offset)
+        if offset != self.offset or self._target_offset is not None:
+            self.offset = offset
+            self._render()
+
+    def _clamp_offset(self, offset):
+        max_loaded = max(0, len(self.rows) - self.visible_rows)
+        max_total = max(0, self.total - self.visible_rows)
+        offset = max(0, min(int(offset), max_total))
+
+        if offset > max_loaded:
+            # Linhas ainda não carregadas: guarda o destino e pede mais páginas
+            self._target_offset = offset
+            offset = max_loaded
+        return offset
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self._scroll_to(float(value) * max(self.total, 1))
+        elif action == "scroll":
+            step = self.visible_rows if unit == "pages" else 1
+            self.scroll(int(value) * step)
+
+    def _on_mousewheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def _on_resize(self, _event=None):
+        children = self.tree.get_children()
+        bbox = self.tree.bbox(children[0]) if children else None
+        if not bbox:
+            return
+        header_height, row_height = bbox[1], bbox[3]
+        visible = max(1, (self.tree.winfo_height() - header_height) // max(row_height, 1))
+        if visible != self.visible_rows:
+            self.visible_rows = visible
+            self._render()
+
+    def _move_selection(self, delta):
+        if not self.rows:
+            return "break"
+        current = self.selected_index if self.selected_index is not None else self.offset - delta
+        index = max(0, min(current + delta, len(self.rows) - 1))
+
+        if index < self.offset:
+            self.offset = index
+        elif index >= self.offset + self.visible_rows:
+            self.offset = index - self.visible_rows + 1
+        self._select(index)
+        self._render()
+        return "break"
+
+    # ---------------------------- DESENHO ---------------------------- #
+    @staticmethod
+    def _iid(position):
+        return f"row{position}"
+
+    def _render(self):
+        count = max(0, min(self.visible_rows, len(self.rows) - self.offset))
+        existing = len(self.tree.get_children())
+
+        # Reaproveita os itens já criados: só cria/remove a diferença
+        for position in range(count, existing):
+            self.tree.delete(self._iid(position))
+        for position in range(existing, count):
+            self.tree.insert("", "end", iid=self._iid(position))
+        for position in range(count):
+            self.tree.item(self._iid(position), values=self.rows[self.offset + position])
+
+        selected = self.selected_index
+        if selected is not None and self.offset <= selected < self.offset + count:
+            iid = self._iid(selected - self.offset)
+            if self.tree.selection() != (iid,):
+                self.tree.selection_set(iid)
+                self.tree.focus(iid)
+        elif self.tree.selection():
+            self.tree.selection_remove(self.tree.selection())
+
+        self._update_scrollbar()
+        self._request_more_if_needed()
+
+    def _update_scrollbar(self):
+        total = max(self.total, 1)
+        first = self.offset / total
+        last = min(1.0, (self.offset + self.visible_rows) / total)
+        self.scrollbar.set(first, last)
+
+    def _request_more_if_needed(self):
+        if not self.on_need_more or self._loading_more or len(self.rows) >= self.total:
+            return
+        near_end = self.offset + self.visible_rows + self.buffer_rows >= len(self.rows)
+        if near_end or self._target_offset is not None:
+            self._loading_more = True
+            # Fora do desenho atual: evita recursão quando várias páginas são puxadas em sequência
+            self.tree.after_idle(self.on_need_more)
+
+    # ---------------------------- SELEÇÃO ---------------------------- #
+    def _select(self, index):
+        if index == self.selected_index:
+            return
+        self.selected_index = index
+        if self.on_select:
+            self.on_select(index)
+
+    def _on_tree_select(self, _event=None):
+        selection = self.tree.selection()
+        if not selection:
+            # Linha selecionada rolou para fora da janela visível: a seleção continua valendo
+            return
+        index = self.offset + int(selection[0][3:])
+        if index < len(self.rows):
+            self._select(index)